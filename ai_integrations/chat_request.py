@@ -1,25 +1,115 @@
 import os
 import json
+import time
+import asyncio
+import weakref
+import logging
+import httpx
 import instructor
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
-from app.models.competitor import Competitor, CompetitorBaseList, SingleCompetitorSearchResult
-from typing import List
+from app.models.competitor import Competitor, CompetitorBaseList, SingleCompetitorSearchResult, BatchCompetitorInsights
+from typing import List, AsyncIterator, Type, TypeVar
+from pydantic import BaseModel
+from ai_integrations.rate_limiter import LLMScheduler, RetryPolicy, estimate_request_tokens
+from app.utils.metrics import llm_request_seconds, record_llm_usage
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai_client = instructor.from_openai(
-    OpenAI(
-        api_key=OPENAI_API_KEY
-    ),
-    mode=instructor.Mode.JSON
-)
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "90"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+
+T = TypeVar("T", bound=BaseModel)
+
+# One pooled client and request scheduler per event loop. httpx connections
+# and asyncio primitives are bound to the loop that created them.
+_loop_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client():
+    """Return the (client, scheduler) pair shared by everything on the running loop"""
+    loop = asyncio.get_running_loop()
+    clients = _loop_clients.get(loop)
+    if clients is None:
+        scheduler = LLMScheduler(OPENAI_MAX_CONCURRENCY)
+        http_client = httpx.AsyncClient(
+            event_hooks={"response": [scheduler.observe_response]},
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+        )
+        client = instructor.from_openai(
+            AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                http_client=http_client,
+                timeout=OPENAI_TIMEOUT_SECONDS,
+                max_retries=0,  # retried by create_chat_completion and the scheduler
+            ),
+            mode=instructor.Mode.JSON
+        )
+        clients = (client, scheduler)
+        _loop_clients[loop] = clients
+    return clients
+
+
+async def close_openai_client():
+    """Close the pooled client of the running loop, if any"""
+    clients = _loop_clients.pop(asyncio.get_running_loop(), None)
+    if clients:
+        await clients[0].client.close()
+
+
+def _usage(response):
+    raw = getattr(response, "_raw_response", response)
+    return getattr(raw, "usage", None)
+
+
+def _used_tokens(response):
+    return getattr(_usage(response), "total_tokens", None)
+
+
+def _record_usage(task_type: str, response):
+    usage = _usage(response)
+    record_llm_usage(task_type, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+
 
+async def create_chat_completion(task_type: str, **kwargs):
+    """Run a chat completion on the shared client through the rate-limit aware scheduler.
 
-def send_openai_request(prompt: str) -> str:
-    completion = openai_client.chat.completions.create(
-        model="gpt-4o", messages=[{"role": "user", "content": prompt}], max_tokens=1000,  
+    task_type labels the call's latency, token and cost metrics.
+    """
+    client, scheduler = get_openai_client()
+    kwargs.setdefault("timeout", OPENAI_TIMEOUT_SECONDS)
+    estimated_tokens = estimate_request_tokens(kwargs["messages"], kwargs.get("max_tokens", 1000))
+    retries = RetryPolicy()
+    while True:
+        try:
+            async with scheduler.slot(estimated_tokens):
+                started = time.perf_counter()
+                response = await client.chat.completions.create(**kwargs)
+                llm_request_seconds.labels(task_type).observe(time.perf_counter() - started)
+            await scheduler.refund(estimated_tokens, _used_tokens(response))
+            _record_usage(task_type, response)
+            return response
+        except Exception as e:
+            attempt = retries.should_retry(e)
+            if attempt is None:
+                raise
+            await scheduler.backoff(attempt, e)
+
+
+async def send_openai_request(prompt: str) -> str:
+    completion = await create_chat_completion(
+        "insights", model="gpt-4o", messages=[{"role": "user", "content": prompt}], max_tokens=1000,
+        response_model=None,
     )
     content = completion.choices[0].message.content
     if not content:
@@ -28,7 +118,8 @@ def send_openai_request(prompt: str) -> str:
 
 async def find_competitors_openai(prompt: str) -> CompetitorBaseList:
     print("AI engine running (find endpoint)")
-    response = openai_client.chat.completions.create(
+    response = await create_chat_completion(
+        "competitor_search",
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "You are an AI assistant that identifies business competitors based on given information."},
@@ -43,7 +134,8 @@ async def find_competitors_openai(prompt: str) -> CompetitorBaseList:
 
 async def lookup_competitor_openai(prompt: str) -> SingleCompetitorSearchResult:
     print("AI engine running (find endpoint)")
-    response = openai_client.chat.completions.create(
+    response = await create_chat_completion(
+        "competitor_lookup",
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "You are an AI assistant that identifies business competitors based on given information."},
@@ -54,3 +146,61 @@ async def lookup_competitor_openai(prompt: str) -> SingleCompetitorSearchResult:
         max_tokens=4060,
     )
     return response
+
+
+async def batch_insights_openai(prompt: str, max_tokens: int) -> BatchCompetitorInsights:
+    response = await create_chat_completion(
+        "batch_insights",
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": "You are an AI assistant that analyzes business competitors."},
+            {"role": "user", "content": prompt}
+        ],
+        response_model=BatchCompetitorInsights,
+        temperature=0.3,
+        max_tokens=max_tokens,
+    )
+    return response
+
+
+async def stream_competitors_openai(prompt: str, response_model: Type[T], task_type: str) -> AsyncIterator[T]:
+    """Yield each competitor as soon as the model has finished generating it.
+
+    Streams don't report usage, so tokens are estimated from the prompt and
+    the competitors received.
+    """
+    logger.info(f"Streaming {task_type} competitors from OpenAI")
+    client, scheduler = get_openai_client()
+    messages = [
+        {"role": "system", "content": "You are an AI assistant that identifies business competitors based on given information."},
+        {"role": "user", "content": prompt}
+    ]
+    estimated_tokens = estimate_request_tokens(messages, 4060)
+    retries = RetryPolicy()
+    while True:
+        received = 0
+        completion_chars = 0
+        try:
+            async with scheduler.slot(estimated_tokens):
+                started = time.perf_counter()
+                competitors = client.chat.completions.create_iterable(
+                    model="gpt-4o",
+                    messages=messages,
+                    response_model=response_model,
+                    temperature=0.1,
+                    max_tokens=4060,
+                    timeout=OPENAI_TIMEOUT_SECONDS,
+                )
+                async for competitor in competitors:
+                    received += 1
+                    completion_chars += len(competitor.model_dump_json())
+                    yield competitor
+                llm_request_seconds.labels(task_type).observe(time.perf_counter() - started)
+            record_llm_usage(task_type, estimate_request_tokens(messages, 0), completion_chars // 4)
+            return
+        except Exception as e:
+            # Only a stream that failed before producing anything can be retried
+            attempt = None if received else retries.should_retry(e)
+            if attempt is None:
+                raise
+            await scheduler.backoff(attempt, e)
@@ -0,0 +1,211 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from collections import Counter
+from typing import Optional
+import httpx
+from openai import RateLimitError, APIConnectionError, InternalServerError
+from app.database import redis_async
+
+logger = logging.getLogger(__name__)
+
+OPENAI_RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", "30000"))
+OPENAI_RATE_LIMIT_RETRIES = int(os.environ.get("OPENAI_RATE_LIMIT_RETRIES", "5"))
+# Connection errors, timeouts and 5xx; the SDK's own retries are turned off
+OPENAI_TRANSIENT_RETRIES = int(os.environ.get("OPENAI_TRANSIENT_RETRIES", "2"))
+RATE_LIMIT_BACKOFF_BASE = 1.0  # seconds
+RATE_LIMIT_BACKOFF_CAP = 30.0  # seconds
+
+# Two token buckets (requests and tokens per minute) shared by every process.
+# Either both are debited or neither; otherwise returns the ms to wait.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+for i = 1, 2 do
+    local capacity = tonumber(ARGV[1 + i])
+    local cost = tonumber(ARGV[3 + i])
+    local rate = capacity / 60000
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + (now - ts) * rate)
+    levels[i] = level
+    if level < cost then
+        wait = math.max(wait, math.ceil((math.min(cost, capacity) - level) / rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i = 1, 2 do
+    redis.call('HSET', KEYS[i], 'level', levels[i] - tonumber(ARGV[3 + i]), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], 120000)
+end
+return 0
+"""
+
+REFUND_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local level = tonumber(redis.call('HGET', KEYS[1], 'level'))
+if level then
+    redis.call('HSET', KEYS[1], 'level', math.min(capacity, level + tonumber(ARGV[2])))
+end
+return 0
+"""
+
+REQUEST_BUCKET_KEY = "llm_bucket:requests"
+TOKEN_BUCKET_KEY = "llm_bucket:tokens"
+
+
+def estimate_request_tokens(messages, max_tokens: int) -> int:
+    """Prompt tokens (about four characters each) plus the completion budget"""
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+def _find_error(error: BaseException, error_types) -> bool:
+    # instructor's retry handling wraps the OpenAI error
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, error_types):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for a 429, also when wrapped by instructor's retry handling"""
+    return _find_error(error, RateLimitError)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """True for connection errors, timeouts (APITimeoutError) and 5xx responses"""
+    return _find_error(error, (APIConnectionError, InternalServerError))
+
+
+class RetryPolicy:
+    """Retry budget of one request: 429s and transient errors are counted separately"""
+
+    def __init__(self):
+        self.attempts = Counter()
+
+    def should_retry(self, error: BaseException) -> Optional[int]:
+        """The attempt number to back off with, or None when the error must be raised"""
+        if is_rate_limit_error(error):
+            kind, limit = "rate_limit", OPENAI_RATE_LIMIT_RETRIES
+        elif is_transient_error(error):
+            kind, limit = "transient", OPENAI_TRANSIENT_RETRIES
+        else:
+            return None
+        attempt = self.attempts[kind]
+        if attempt >= limit:
+            return None
+        self.attempts[kind] += 1
+        return attempt
+
+
+class LLMScheduler:
+    """Admission control in front of the OpenAI API.
+
+    Requests take from the shared Redis token buckets before they are sent,
+    local concurrency adapts AIMD-style (additive increase on success,
+    multiplicative decrease on 429s or near-exhausted rate limit headers),
+    and 429s and transient errors are retried with jittered exponential
+    backoff. One instance per
+    event loop.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.rpm_limit = OPENAI_RPM_LIMIT
+        self.tpm_limit = OPENAI_TPM_LIMIT
+        self._condition = asyncio.Condition()
+
+    async def _take_from_buckets(self, tokens: int):
+        tokens = min(tokens, self.tpm_limit)
+        while True:
+            try:
+                wait_ms = await redis_async.eval(
+                    TOKEN_BUCKET_SCRIPT, 2, REQUEST_BUCKET_KEY, TOKEN_BUCKET_KEY,
+                    int(time.time() * 1000), self.rpm_limit, self.tpm_limit, 1, tokens
+                )
+            except Exception as e:
+                # Fail open, the AIMD limit and 429 retries still apply
+                logger.error(f"LLM token bucket unavailable: {str(e)}")
+                return
+            if not wait_ms:
+                return
+            await asyncio.sleep(wait_ms / 1000 * random.uniform(1.0, 1.2))
+
+    async def refund(self, estimated_tokens: int, used_tokens: Optional[int]):
+        """Return over-estimated tokens to the shared bucket"""
+        if used_tokens is None or used_tokens >= estimated_tokens:
+            return
+        try:
+            await redis_async.eval(REFUND_SCRIPT, 1, TOKEN_BUCKET_KEY, self.tpm_limit, estimated_tokens - used_tokens)
+        except Exception as e:
+            logger.error(f"Error refunding LLM tokens: {str(e)}")
+
+    def _increase(self):
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _decrease(self, factor: float):
+        self.limit = max(1.0, self.limit * factor)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        """Hold one admitted request for the duration of the block"""
+        await self._take_from_buckets(tokens)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        except BaseException as e:
+            if is_rate_limit_error(e):
+                self._decrease(0.5)
+            raise
+        else:
+            self._increase()
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    async def backoff(self, attempt: int, error: BaseException):
+        """Sleep before retrying a failed request, honouring Retry-After when present"""
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        delay = retry_after or min(RATE_LIMIT_BACKOFF_CAP, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt)
+        delay = random.uniform(delay / 2, delay)  # jitter
+        reason = "rate limited" if is_rate_limit_error(error) else f"request failed ({type(error).__name__})"
+        logger.warning(f"OpenAI {reason}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+        await asyncio.sleep(delay)
+
+    async def observe_response(self, response: httpx.Response):
+        """httpx response hook: follow the account limits and back off before hitting them"""
+        headers = response.headers
+        try:
+            if "x-ratelimit-limit-requests" in headers:
+                self.rpm_limit = int(headers["x-ratelimit-limit-requests"])
+            if "x-ratelimit-limit-tokens" in headers:
+                self.tpm_limit = int(headers["x-ratelimit-limit-tokens"])
+            remaining_requests = int(headers.get("x-ratelimit-remaining-requests", self.rpm_limit))
+            remaining_tokens = int(headers.get("x-ratelimit-remaining-tokens", self.tpm_limit))
+        except ValueError:
+            return
+        if remaining_requests < self.rpm_limit * 0.05 or remaining_tokens < self.tpm_limit * 0.05:
+            self._decrease(0.75)
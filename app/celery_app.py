@@ -1,17 +1,27 @@
 import os
 from celery import Celery
+from kombu import Queue
+from celery.signals import worker_shutdown, task_postrun
 import asyncio
+import time
 from datetime import datetime
 import json
 from uuid import uuid4
 import logging
 from app.services.ai_insights import find_competitors_ai, lookup_competitor_ai
-from app.database import redis_client, get_collection
-from app.utils.logo_fetcher import fetch_logo_url_sync
+from ai_integrations.chat_request import close_openai_client
+from app.database import redis_client, get_sync_collection
+from pymongo.errors import BulkWriteError
+from app.utils.logo_fetcher import resolve_logos, close_logo_session, update_competitor_logos_in_db_sync, PLACEHOLDER_LOGO_URL
+from app.utils.http_client import close_http_client
+from app.utils.async_runtime import AsyncRuntime
+from app.services.search_cache import get_cached_search, cache_search_result
+from app.services.singleflight import release_search, refresh_search
 import ssl
 from urllib.parse import urlparse
 from app.config import settings
-from concurrent.futures import ThreadPoolExecutor
+from app.utils.serialization import FAST_SERIALIZATION, ORJSON_AVAILABLE, register_celery_serializer
+from app.utils.metrics import record_cache, search_stage_seconds, time_stage, push_metrics
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -19,12 +29,50 @@ logger = logging.getLogger(__name__)
 # Global event loop policy
 asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
 
-# Create a global thread pool executor
-thread_pool = ThreadPoolExecutor(max_workers=3)
+# Dedicated queue per work type, each consumed by its own worker process
+# (see Procfile) so a backlog on one queue can't take the threads of another.
+# The threads pool ignores Celery's time limits, so time_limit bounds the
+# task's coroutines through worker_runtime.run(timeout=...).
+TASK_QUEUES = {
+    'lookup': {'concurrency': settings.LOOKUP_WORKER_CONCURRENCY, 'time_limit': 120},
+    'find': {'concurrency': settings.FIND_WORKER_CONCURRENCY, 'time_limit': 240},
+    'insights': {'concurrency': settings.INSIGHTS_WORKER_CONCURRENCY, 'time_limit': 120},
+    'logos': {'concurrency': settings.LOGO_WORKER_CONCURRENCY, 'time_limit': 60},
+}
 
-def run_in_executor(func, *args):
-    """Run a function in the thread pool"""
-    return thread_pool.submit(func, *args).result()
+def search_queue(task_type: str) -> str:
+    return 'find' if task_type == 'competitor_search' else 'lookup'
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Route each task to the queue of its work type"""
+    if name == 'process_competitor_search':
+        queue = search_queue(args[0] if args else kwargs.get('task_type'))
+    elif name == 'enrich_competitor_logos':
+        queue = 'logos'
+    elif name == 'refresh_competitor_insights':
+        queue = 'insights'
+    else:
+        return None
+    return {'queue': queue}
+
+def get_worker_queues():
+    """Queues this worker consumes, from WORKER_QUEUES (pass the same list to -Q)"""
+    return [queue.strip() for queue in settings.WORKER_QUEUES.split(',') if queue.strip() in TASK_QUEUES]
+
+# One long-lived event loop per worker process, shared by all task threads
+worker_runtime = AsyncRuntime(settings.WORKER_ASYNC_CONCURRENCY)
+worker_runtime.add_shutdown_hook(close_openai_client)
+worker_runtime.add_shutdown_hook(close_http_client)
+worker_runtime.add_shutdown_hook(close_logo_session)
+
+@worker_shutdown.connect
+def stop_worker_runtime(**kwargs):
+    worker_runtime.stop()
+    push_metrics(force=True)
+
+@task_postrun.connect
+def push_task_metrics(**kwargs):
+    push_metrics()
 
 def get_redis_url():
     """Get Redis URL from environment with fallback"""
@@ -46,15 +94,24 @@ def get_celery_config():
             'broker_connection_timeout': 30,
             'broker_connection_max_retries': 10,
             'broker_pool_limit': None,
-            'task_serializer': 'json',
-            'accept_content': ['json'],
+            'task_serializer': 'orjson' if FAST_SERIALIZATION else 'json',
+            # Accept orjson whenever it is installed, whatever this process's flag,
+            # so workers and API can be switched over independently
+            'accept_content': ['json', 'orjson'] if ORJSON_AVAILABLE else ['json'],
             'result_serializer': 'json',
+            # Results are tracked in task:{id} and Mongo, not in the result backend
+            'task_ignore_result': True,
             'timezone': 'UTC',
             'enable_utc': True,
-            'worker_max_tasks_per_child': 50,
+            # Task threads block on the shared event loop, so one process runs
+            # several I/O bound searches at once
+            'worker_pool': 'threads',
+            'worker_concurrency': sum(TASK_QUEUES[queue]['concurrency'] for queue in get_worker_queues())
+                                  or settings.WORKER_CONCURRENCY,
             'worker_prefetch_multiplier': 1,
-            'task_time_limit': 300,
-            'task_soft_time_limit': 240,
+            'task_queues': [Queue(queue) for queue in TASK_QUEUES],
+            'task_default_queue': 'find',
+            'task_routes': (route_task,),
         }
         
         # Add SSL configuration if using secure Redis
@@ -73,6 +130,9 @@ def get_celery_config():
         logger.error(f"Failed to configure Celery: {str(e)}")
         raise
 
+if ORJSON_AVAILABLE:
+    register_celery_serializer()
+
 # Initialize Celery app
 try:
     celery_app = Celery('competitor_tasks')
@@ -92,9 +152,17 @@ def verify_config():
         'timestamp': datetime.utcnow().isoformat()
     }
 
+def task_events_channel(task_id: str) -> str:
+    """Redis pub/sub channel carrying status events for a task"""
+    return f"task_events:{task_id}"
+
 # Add error handling for Redis operations
 def update_task_status(task_id: str, status: str, result=None, error=None):
-    """Update task status in Redis with retry logic"""
+    """Update task status in Redis with retry logic.
+
+    The record only references the stored search (search_id and total); the
+    competitors themselves are read from Mongo when the status is requested.
+    """
     max_retries = 3
     retry_delay = 1  # seconds
     
@@ -104,59 +172,106 @@ def update_task_status(task_id: str, status: str, result=None, error=None):
     }
     
     if result:
-        task_data["result"] = result
+        task_data["search_id"] = result["search_id"]
+        task_data["total"] = result["total"]
     if error:
         task_data["error"] = error
     
+    payload = json.dumps(task_data)
     for attempt in range(max_retries):
         try:
-            redis_client.set(
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.set(
                 f"task:{task_id}",
-                json.dumps(task_data),
+                payload,
                 ex=3600  # 1 hour expiration
             )
+            # Push the transition to clients subscribed via the events endpoint
+            pipe.publish(task_events_channel(task_id), payload)
+            pipe.execute()
             return
         except Exception as e:
             if attempt == max_retries - 1:
                 logger.error(f"Failed to update task status after {max_retries} attempts: {str(e)}")
                 raise
-            asyncio.sleep(retry_delay * (attempt + 1))
+            time.sleep(retry_delay * (attempt + 1))
+
+def append_partial_result(task_id: str, competitor, received: int):
+    """Append a streamed competitor to the task's partial results in Redis"""
+    try:
+        partial_key = f"task:{task_id}:partial"
+        competitor_dict = competitor.dict(by_alias=True)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.rpush(partial_key, json.dumps(competitor_dict))
+        pipe.expire(partial_key, 3600)  # 1 hour expiration
+        pipe.publish(task_events_channel(task_id), json.dumps({
+            "status": "processing",
+            "competitor": competitor_dict,
+            "received": received
+        }))
+        pipe.execute()
+    except Exception as e:
+        # Partial results are best effort, the final result is written on completion
+        logger.error(f"Failed to append partial result {received} for task {task_id}: {str(e)}")
+
+def get_cached_logos_sync(websites):
+    """Fetch cached logos for all websites with a single MGET"""
+    if not websites:
+        return {}
+    try:
+        cached = redis_client.mget([f"logo:{website}" for website in websites])
+        logos = {website: logo for website, logo in zip(websites, cached) if logo}
+        record_cache("logo", "hit", len(logos))
+        record_cache("logo", "miss", len(websites) - len(logos))
+        return logos
+    except Exception as e:
+        logger.error(f"Error reading cached logos: {str(e)}")
+        return {}
+
+def cache_logos_sync(logos):
+    """Write newly resolved logos to Redis in one pipeline"""
+    if not logos:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for website, logo_url in logos.items():
+            pipe.set(f"logo:{website}", logo_url, ex=86400)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error caching logos: {str(e)}")
 
 def store_search_results_sync(competitors, search_id):
-    """Synchronous version of store_search_results"""
-    processed_competitors = []
-    competitor_collection = get_collection("competitors")
-    
+    """Synchronous version of store_search_results.
+
+    Cached logos are read with one MGET and the competitors inserted with a
+    single unordered insert_many. Competitors without a cached logo get the
+    placeholder; enrich_competitor_logos resolves them afterwards.
+    """
+    competitor_dicts = []
     for competitor in competitors:
+        competitor_dict = competitor.dict(by_alias=True)
+        competitor_dict['search_id'] = search_id
+        competitor_dict['_id'] = str(uuid4())
+        competitor_dicts.append(competitor_dict)
+    
+    websites = sorted({c['website'] for c in competitor_dicts if c.get('website')})
+    logos = get_cached_logos_sync(websites)
+    
+    for competitor_dict in competitor_dicts:
+        if competitor_dict.get('website'):
+            competitor_dict['logo'] = logos.get(competitor_dict['website'], PLACEHOLDER_LOGO_URL)
+        else:
+            competitor_dict['logo'] = "default_logo_url"
+    
+    processed_competitors = competitor_dicts
+    if competitor_dicts:
+        competitor_collection = get_sync_collection("competitors")
         try:
-            competitor_dict = competitor.dict(by_alias=True)
-            competitor_dict['search_id'] = search_id
-            
-            if competitor.website:
-                try:
-                    cached_logo = redis_client.get(f"logo:{competitor.website}")
-                    if cached_logo:
-                        logo_url = cached_logo.decode() if isinstance(cached_logo, bytes) else cached_logo
-                    else:
-                        # Use synchronous logo fetcher
-                        logo_url = fetch_logo_url_sync(competitor.website)
-                        if logo_url:
-                            redis_client.set(f"logo:{competitor.website}", logo_url, ex=86400)
-                    competitor_dict['logo'] = logo_url
-                except Exception as e:
-                    logger.error(f"Error fetching logo for {competitor.website}: {str(e)}")
-                    competitor_dict['logo'] = "default_logo_url"
-            else:
-                competitor_dict['logo'] = "default_logo_url"
-
-            unique_id = str(uuid4())
-            competitor_dict['_id'] = unique_id
-            
-            competitor_collection.insert_one(competitor_dict)
-            processed_competitors.append(competitor_dict)
-        except Exception as e:
-            logger.error(f"Error processing competitor: {str(e)}")
-            continue
+            competitor_collection.insert_many(competitor_dicts, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            logger.error(f"Failed to insert {len(failed)} competitors for search {search_id}")
+            processed_competitors = [c for i, c in enumerate(competitor_dicts) if i not in failed]
     
     return {
         "competitors": processed_competitors,
@@ -165,41 +280,107 @@ def store_search_results_sync(competitors, search_id):
     }
 
 @celery_app.task(name='process_competitor_search')
-def process_competitor_search(task_type: str, params: dict, task_id: str):
+def process_competitor_search(task_type: str, params: dict, task_id: str, enqueued_at: float = None):
     """Celery task to process competitor searches"""
     search_id = str(uuid4())
+    if enqueued_at:
+        search_stage_seconds.labels(task_type, "queue_wait").observe(max(0.0, time.time() - enqueued_at))
     
     try:
-        update_task_status(task_id, "processing")
+        with time_stage(task_type, "status_write"):
+            update_task_status(task_id, "processing")
         
-        # Run async operations in a dedicated thread
-        def run_async_task():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                if task_type == "competitor_search":
-                    competitors = loop.run_until_complete(find_competitors_ai(
-                        params["business_description"],
-                        params["location"]
-                    ))
-                else:
-                    competitors = loop.run_until_complete(lookup_competitor_ai(
-                        params["name_or_url"]
-                    ))
-                return competitors
-            finally:
-                loop.close()
+        # The in-flight claim covered the wait in the queue; from now on it
+        # only has to outlive this run (the LLM call plus storing the results)
+        time_limit = TASK_QUEUES[search_queue(task_type)]['time_limit']
+        refresh_search(task_type, params, task_id, time_limit + 60)
         
-        # Run the async operation in the thread pool
-        competitors = run_in_executor(run_async_task)
+        # Fallback for searches cached while this one waited in the queue;
+        # create_background_task already served (and counted) earlier hits
+        with time_stage(task_type, "cache_lookup"):
+            cached_result = get_cached_search(task_type, params, record_stats=False)
+            if cached_result and not get_sync_collection("competitors").count_documents(
+                    {"search_id": cached_result["search_id"]}, limit=1):
+                cached_result = None
+        if cached_result:
+            logger.info(f"Search cache hit for task {task_id}")
+            with time_stage(task_type, "status_write"):
+                update_task_status(task_id, "completed", result=cached_result)
+            return cached_result
+        
+        # Stream each validated competitor into Redis as it arrives
+        on_competitor = None
+        if settings.STREAM_SEARCH_RESULTS:
+            # The Redis write runs in a thread so it doesn't block the shared event loop
+            on_competitor = lambda competitor, received: asyncio.to_thread(
+                append_partial_result, task_id, competitor, received
+            )
+        
+        # Run the AI call on the worker's shared event loop, bounded by the queue's time limit
+        with time_stage(task_type, "llm"):
+            if task_type == "competitor_search":
+                competitors = worker_runtime.run(find_competitors_ai(
+                    params["business_description"],
+                    params["location"],
+                    on_competitor=on_competitor
+                ), timeout=time_limit)
+            else:
+                competitors = worker_runtime.run(lookup_competitor_ai(
+                    params["name_or_url"],
+                    on_competitor=on_competitor
+                ), timeout=time_limit)
         
         # Process results synchronously
-        result = store_search_results_sync(competitors, search_id)
-        update_task_status(task_id, "completed", result=result)
-        return result
+        with time_stage(task_type, "persistence"):
+            result = store_search_results_sync(competitors, search_id)
+            search_ref = {"search_id": search_id, "total": result["total"]}
+            cache_search_result(task_type, params, search_ref)
+        with time_stage(task_type, "status_write"):
+            update_task_status(task_id, "completed", result=search_ref)
+        
+        # Resolve missing logos in a separate stage on the logos queue
+        if any(c['logo'] == PLACEHOLDER_LOGO_URL for c in result["competitors"]):
+            enrich_competitor_logos.apply_async(args=[search_id, task_type])
+        return search_ref
         
     except Exception as e:
         logger.error(f"Error processing search: {str(e)}")
         update_task_status(task_id, "failed", error=str(e))
         raise
+    finally:
+        release_search(task_type, params, task_id)
+        if redis_client:
+            redis_client.delete(f"task:{task_id}:partial")
+
+@celery_app.task(name='enrich_competitor_logos')
+def enrich_competitor_logos(search_id: str, task_type: str = "competitor_search"):
+    """Resolve placeholder logos of a stored search"""
+    competitor_collection = get_sync_collection("competitors")
+    pending = list(competitor_collection.find(
+        {"search_id": search_id, "logo": PLACEHOLDER_LOGO_URL},
+        {"website": 1}
+    ))
+    if not pending:
+        return {"search_id": search_id, "updated": 0}
+    
+    websites = sorted({c['website'] for c in pending if c.get('website')})
+    logos = get_cached_logos_sync(websites)
+    with time_stage(task_type, "logos"):
+        new_logos = worker_runtime.run(
+            resolve_logos([website for website in websites if website not in logos]),
+            timeout=TASK_QUEUES['logos']['time_limit']
+        )
+    cache_logos_sync(new_logos)
+    logos.update(new_logos)
+    
+    updates = {c['_id']: logos[c['website']] for c in pending if logos.get(c.get('website'))}
+    update_competitor_logos_in_db_sync(updates)
+    
+    return {"search_id": search_id, "updated": len(updates)}
+
+@celery_app.task(name='refresh_competitor_insights')
+def refresh_competitor_insights(competitor_id: str):
+    """Revalidate stale insights of a competitor on the insights queue"""
+    # Imported here, the insights cache enqueues this task through celery_app
+    from app.services.insights_cache import refresh_insights_by_id
+    worker_runtime.run(refresh_insights_by_id(competitor_id), timeout=TASK_QUEUES['insights']['time_limit'])
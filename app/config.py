@@ -1,10 +1,16 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
     # Existing settings
     MONGODB_URL: str = os.environ.get("MONGODB_URL", "mongodb://localhost:27017/fyc")
     REDIS_URL: str = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_RETRY_ATTEMPTS: int = 3
+    REDIS_PUBSUB_MAX_CONNECTIONS: int = 10
     DATABASE_NAME: str = "fyc_prod_db"
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
@@ -22,6 +28,60 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     RESET_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # orjson for API responses and Celery messages (requires orjson)
+    FAST_SERIALIZATION: bool = False
+
+    # Search result cache
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+    SEARCH_CACHE_MAX_ENTRIES: int = 10000
+
+    # Stream competitors into the task record while the LLM is generating
+    STREAM_SEARCH_RESULTS: bool = True
+
+    # Authenticated user cache (per-process LRU in front of Redis)
+    USER_CACHE_LOCAL_TTL_SECONDS: int = 10
+    USER_CACHE_LOCAL_MAX_ENTRIES: int = 10000
+    USER_CACHE_REDIS_TTL_SECONDS: int = 300
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # Token revocation filter
+    REVOCATION_FILTER_CAPACITY: int = 100000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_FILTER_REBUILD_SECONDS: int = 600
+
+    # Logo providers, {domain} is replaced with the competitor's domain
+    LOGO_PROVIDER_URL: str = "https://logo.clearbit.com/{domain}"
+    FAVICON_PROVIDER_URL: str = "https://www.google.com/s2/favicons?domain={domain}"
+
+    # Competitor insights cache
+    INSIGHTS_TTL_SECONDS: int = 24 * 60 * 60
+    INSIGHTS_STALE_SECONDS: int = 7 * 24 * 60 * 60
+
+    # Metrics: workers push to the Pushgateway when a URL is set, LLM cost is
+    # estimated from token usage
+    PUSHGATEWAY_URL: Optional[str] = None
+    METRICS_PUSH_INTERVAL_SECONDS: float = 15.0
+    LLM_PROMPT_COST_PER_1K_TOKENS: float = 0.0025
+    LLM_COMPLETION_COST_PER_1K_TOKENS: float = 0.01
+
+    # Celery worker execution: task threads per process, and how many of their
+    # coroutines the shared event loop runs at once
+    WORKER_CONCURRENCY: int = 8
+    WORKER_ASYNC_CONCURRENCY: int = 8
+
+    # Queues consumed by this worker (one per worker process in production,
+    # several only for local development) and task threads per queue
+    WORKER_QUEUES: str = "find,lookup,logos,insights"
+    FIND_WORKER_CONCURRENCY: int = 4
+    LOOKUP_WORKER_CONCURRENCY: int = 4
+    LOGO_WORKER_CONCURRENCY: int = 2
+    INSIGHTS_WORKER_CONCURRENCY: int = 2
+
     class Config:
         env_file = ".env"
         case_sensitive = True  # Make sure environment variables are case-sensitive
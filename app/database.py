@@ -1,10 +1,16 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, IndexModel, ASCENDING, TEXT
+from pymongo.errors import OperationFailure, PyMongoError
 from app.config import settings
 import redis.asyncio as aioredis
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 import os
 import logging
-from typing import Optional
+import threading
+from typing import Optional, Dict, List, Any
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
@@ -13,36 +19,209 @@ logger = logging.getLogger(__name__)
 try:
     redis_url = settings.REDIS_URL
     
-    # Sync Redis client
+    # Sync Redis client, only for Celery workers. Async code paths must use redis_async.
     redis_client = redis.from_url(
         redis_url,
         decode_responses=True,
         ssl_cert_reqs=None
     )
     
-    # Async Redis client
-    redis_async = aioredis.from_url(
+    # Async Redis client on one explicitly sized pool, with health checks and
+    # retries on connection errors and timeouts
+    redis_async_pool = aioredis.ConnectionPool.from_url(
         redis_url,
         decode_responses=True,
-        ssl_cert_reqs=None
+        ssl_cert_reqs=None,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.05), settings.REDIS_RETRY_ATTEMPTS),
+        retry_on_error=[RedisConnectionError, RedisTimeoutError],
+    )
+    redis_async = aioredis.Redis(connection_pool=redis_async_pool)
+    
+    # Pub/sub subscriptions sit idle between messages, so they get their own
+    # pool without a socket timeout and never hold connections of redis_async
+    redis_pubsub_pool = aioredis.ConnectionPool.from_url(
+        redis_url,
+        decode_responses=True,
+        ssl_cert_reqs=None,
+        max_connections=settings.REDIS_PUBSUB_MAX_CONNECTIONS,
+        socket_timeout=None,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
     )
+    redis_pubsub = aioredis.Redis(connection_pool=redis_pubsub_pool)
 
 except Exception as e:
     logger.error(f"Redis initialization failed: {str(e)}")
     redis_client = None
+    redis_async_pool = None
     redis_async = None
+    redis_pubsub_pool = None
+    redis_pubsub = None
 
 
 # Initialize MongoDB client
 client = AsyncIOMotorClient(settings.MONGODB_URL)
 db = client[settings.DATABASE_NAME]
 
+# Indexes backing the hot queries, reconciled on startup by init_db
+REQUIRED_INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "competitors": [
+        IndexModel([("search_id", ASCENDING), ("_id", ASCENDING)], name="search_id_id"),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("name", ASCENDING)], name="name"),
+        IndexModel(
+            [("business_type", TEXT), ("location", TEXT), ("name", TEXT), ("description", TEXT)],
+            name="competitor_text",
+            weights={"business_type": 10, "location": 5, "name": 3, "description": 1},
+            default_language="english"
+        ),
+    ],
+    "user_searches": [
+        IndexModel([("user_id", ASCENDING), ("search_id", ASCENDING)], name="user_id_search_id", unique=True),
+    ],
+}
+
+# Representative filters/sorts of the hot queries, checked with explain()
+HOT_QUERIES = {
+    "users.email": ("users", {"email": "probe@example.com"}, None),
+    "competitors.search_id": ("competitors", {"search_id": "probe"}, [("_id", ASCENDING)]),
+    "competitors.user_id": ("competitors", {"user_id": "probe"}, None),
+    "competitors.user_id_id": ("competitors", {"user_id": "probe", "_id": "probe"}, None),
+    "competitors.name": ("competitors", {"name": {"$in": ["probe"]}}, None),
+    "competitors.text": ("competitors", {"$text": {"$search": "probe"}}, None),
+    "user_searches.user_id_search_id": ("user_searches", {"user_id": "probe", "search_id": {"$in": ["probe"]}}, None),
+}
+
+INDEX_NOT_FOUND = 27  # MongoDB error code
+
+# Sync MongoDB client for Celery workers, created on first use
+sync_client: Optional[MongoClient] = None
+_sync_client_lock = threading.Lock()
+
+def _index_matches(current: Dict[str, Any], spec: Dict[str, Any]) -> bool:
+    if current.get("unique", False) != spec.get("unique", False):
+        return False
+    if "weights" in spec:
+        # Text indexes are stored as _fts/_ftsx keys, compare their weights instead
+        return current.get("weights") == spec["weights"]
+    return list(current["key"]) == list(spec["key"].items())
+
+async def ensure_indexes():
+    """Create missing indexes and rebuild ones whose definition changed"""
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except PyMongoError as e:
+            logger.error(f"Could not list indexes of {collection_name}: {str(e)}")
+            continue
+        for index in indexes:
+            spec = index.document
+            name = spec["name"]
+            current = existing.get(name)
+            if current and _index_matches(current, spec):
+                continue
+            try:
+                if current:
+                    logger.info(f"Index {collection_name}.{name} changed, rebuilding")
+                    try:
+                        await collection.drop_index(name)
+                    except OperationFailure as e:
+                        # Another process starting up dropped it first
+                        if e.code != INDEX_NOT_FOUND:
+                            raise
+                await collection.create_indexes([index])
+                logger.info(f"Created index {collection_name}.{name}")
+            except PyMongoError as e:
+                # e.g. duplicate emails already stored block the unique index
+                logger.error(f"Could not create index {collection_name}.{name}: {str(e)}")
+
+async def get_index_report() -> Dict[str, Dict[str, List[str]]]:
+    """Report missing, undeclared and unused (zero ops since restart) indexes per collection"""
+    report = {}
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = db[collection_name]
+        declared = {index.document["name"] for index in indexes}
+        existing = set(await collection.index_information())
+        unused = []
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["accesses"]["ops"] == 0 and stats["name"] != "_id_":
+                    unused.append(stats["name"])
+        except OperationFailure as e:
+            logger.warning(f"$indexStats unavailable for {collection_name}: {str(e)}")
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared - {"_id_"}),
+            "unused": sorted(unused),
+        }
+    return report
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages += _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+async def explain_hot_queries() -> Dict[str, bool]:
+    """Run explain() on each hot query and report whether it is served by an index.
+
+    Queries that cannot be explained (e.g. a $text query whose text index
+    failed to build) are logged and left out.
+    """
+    results = {}
+    for query_name, (collection_name, query, sort) in HOT_QUERIES.items():
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.explain()
+        except PyMongoError as e:
+            logger.error(f"Could not explain hot query {query_name}: {str(e)}")
+            continue
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        results[query_name] = any(
+            stage in ("IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "TEXT", "TEXT_MATCH") for stage in stages
+        ) and "COLLSCAN" not in stages
+    return results
+
+async def log_index_diagnostics():
+    """Log hot queries not served by an index and the index report; never raises"""
+    try:
+        for query_name, uses_index in (await explain_hot_queries()).items():
+            if not uses_index:
+                logger.warning(f"Hot query {query_name} is not served by an index")
+        report = await get_index_report()
+        for collection_name, collection_report in report.items():
+            if collection_report["missing"]:
+                logger.warning(f"Missing indexes on {collection_name}: {collection_report['missing']}")
+            if collection_report["undeclared"]:
+                logger.info(f"Undeclared indexes on {collection_name}: {collection_report['undeclared']}")
+            if collection_report["unused"]:
+                logger.info(f"Unused indexes on {collection_name} since restart: {collection_report['unused']}")
+    except PyMongoError as e:
+        logger.error(f"Could not check indexes: {str(e)}")
+
 async def init_db():
     try:
         # Check MongoDB connection
         await client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
         
+        await ensure_indexes()
+        await log_index_diagnostics()
+        
         # Check async Redis connection if available
         if redis_async:
             is_redis_connected = await redis_async.ping()
@@ -57,13 +236,29 @@ async def init_db():
 def get_collection(collection_name: str):
     return db[collection_name]
 
+def get_sync_collection(collection_name: str):
+    """Get a collection on the blocking pymongo client, for use outside an event loop"""
+    global sync_client
+    if sync_client is None:
+        # Task threads may get here at the same time; only one creates the client
+        with _sync_client_lock:
+            if sync_client is None:
+                sync_client = MongoClient(settings.MONGODB_URL)
+    return sync_client[settings.DATABASE_NAME][collection_name]
+
 async def close_db():
     try:
         if redis_async:
-            await redis_async.close()
+            await redis_async.aclose()
+            await redis_async_pool.disconnect()
+        if redis_pubsub:
+            await redis_pubsub.aclose()
+            await redis_pubsub_pool.disconnect()
         if redis_client:
             redis_client.close()
         client.close()
+        if sync_client:
+            sync_client.close()
         logger.info("Database connections closed")
     except Exception as e:
         logger.error(f"Error closing database connections: {str(e)}")
@@ -71,3 +266,13 @@ async def close_db():
 # Utility function to check if Redis is available
 def is_redis_available() -> bool:
     return redis_client is not None and redis_async is not None
+
+async def check_redis_health() -> bool:
+    """Ping Redis through the async pool"""
+    if not redis_async:
+        return False
+    try:
+        return await redis_async.ping()
+    except Exception as e:
+        logger.error(f"Redis health check failed: {str(e)}")
+        return False
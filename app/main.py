@@ -1,14 +1,22 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import auth, competitors
-from app.database import init_db, close_db
+from app.database import init_db, close_db, check_redis_health
 from app.config import settings
+from app.services.token_revocation import revocation_filter
+from app.services.background_tasks import task_event_hub
+from app.utils.serialization import FAST_SERIALIZATION, FastJSONResponse
+from app.utils.metrics import render_metrics
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="FYC Product API")
+app = FastAPI(
+    title="FYC Product API",
+    default_response_class=FastJSONResponse if FAST_SERIALIZATION else JSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -27,16 +35,34 @@ app.include_router(competitors.router, prefix="/competitors", tags=["Competitors
 async def startup_event():
     logger.info(f"MongoDB URL: {settings.MONGODB_URL}")
     await init_db()
+    await revocation_filter.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application...")
+    await revocation_filter.stop()
+    await task_event_hub.close()
     await close_db()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to FYC Product Backend API"}
 
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Liveness of this process and its Redis connection"""
+    redis_ok = await check_redis_health()
+    return JSONResponse(
+        status_code=200 if redis_ok else 503,
+        content={"status": "ok" if redis_ok else "degraded", "redis": redis_ok}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this process"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
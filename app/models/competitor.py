@@ -61,6 +61,17 @@ class CompetitorInsights(BaseModel):
     competitor_id: str
     insights: List[str]
 
+class BatchCompetitorInsights(BaseModel):
+    items: List[CompetitorInsights] = Field(description="Insights for each competitor, keyed by competitor_id")
+
+class BatchInsightsItem(CompetitorInsights):
+    insights: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
+
+class BatchInsightsRequest(BaseModel):
+    competitor_ids: List[str] = Field(default_factory=list, max_length=100)
+    search_id: Optional[str] = None
+
 class CompetitorCreate(CompetitorBase):
     pass
 
@@ -3,6 +3,7 @@ from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from app.services.email_service import send_reset_email
 from app.services.token_service import generate_reset_token
 import logging
+from jose import JWTError, jwt
 from app.models.user import (
     UserCreate, User, Token, PasswordResetRequest, 
     PasswordResetResponse, PasswordReset, GoogleAuthData
@@ -11,7 +12,8 @@ from app.services.auth import (
     create_user, authenticate_user, create_access_token,
     get_current_user, reset_password, authenticate_google_user
 )
-from app.database import get_collection, redis_client
+from app.database import get_collection
+from app.services.token_revocation import revoke_token
 from app.config import settings
 
 router = APIRouter()
@@ -70,13 +72,14 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 async def logout(token: str = Depends(oauth2_scheme)):
     """Handle logout for both traditional and Google auth"""
     try:
-        # Add token to blacklist
-        redis_key = f"blacklist_token:{token}"
-        redis_client.set(
-            redis_key,
-            "true",
-            ex=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        )
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        # Invalid or expired tokens are already unusable
+        return {"message": "Successfully logged out"}
+    try:
+        # Revoke the token until it expires
+        if payload.get("jti"):
+            await revoke_token(payload["jti"], payload["exp"])
         return {"message": "Successfully logged out"}
     except Exception as e:
         logger.error(f"Logout error: {str(e)}")
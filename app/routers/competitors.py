@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query, Header, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
-from app.services.background_tasks import create_background_task, get_task_status, TaskStatus
+from app.services.background_tasks import create_background_task, get_task_status, get_partial_results, stream_task_events, TaskStatus
+from app.services.search_cache import get_search_cache_stats
 from app.models.competitor import (
     CompetitorCreate,
     CompetitorUpdate,
@@ -9,10 +11,12 @@ from app.models.competitor import (
     CompetitorSearch,
     CompetitorSearchAi,
     CompetitorInsights,
+    BatchInsightsItem,
+    BatchInsightsRequest,
 )
 from app.database import get_collection
 from app.models.user import User
-from app.services.auth import get_current_user
+from app.services.auth import get_current_user, get_optional_user
 from app.services.competitor import (
     create_competitor,
     get_competitors,
@@ -20,11 +24,18 @@ from app.services.competitor import (
     delete_competitor,
     search_competitors,
     insert_competitors,
-    get_existing_search_results
+    get_existing_search_results,
+    get_search_result,
+    record_user_search,
 )
-from app.services.ai_insights import (
-    generate_competitor_insights,
+from app.services.ai_insights import EXPECTED_COMPETITORS
+from app.services.insights_cache import (
+    get_competitor_insights_cached,
+    competitor_document_id,
+    load_competitors_for_insights,
+    get_batch_insights,
 )
+from app.utils.serialization import direct_response
 from app.utils.logo_fetcher import (
     fetch_logo_url,
     update_competitor_logo_in_db,
@@ -63,9 +74,12 @@ async def remove_competitor(
 
 @router.post("/search", response_model=CompetitorList)
 async def search_for_competitors(
-        search: CompetitorSearch, current_user: User = Depends(get_current_user)
+        search: CompetitorSearch,
+        offset: int = Query(default=0, ge=0),
+        limit: int = Query(default=20, ge=1, le=100),
+        current_user: User = Depends(get_current_user)
 ):
-    return await search_competitors(search.business_type, search.location)
+    return await search_competitors(search.business_type, search.location, offset, limit)
 
 
 @router.post("/find", response_model=Dict[str, Any])
@@ -73,11 +87,19 @@ async def find_competitors_with_ai(
     find: CompetitorSearchAi,
     search_id: Optional[str] = None,
     offset: int = Query(default=0, ge=0),
-    limit: int = Query(default=6, ge=1)
+    limit: int = Query(default=6, ge=1),
+    after: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated fields to return"),
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     """Endpoint for AI-powered competitor search with background processing"""
     if search_id:
-        return await get_existing_search_results(search_id, offset, limit)
+        results = await get_existing_search_results(
+            search_id, offset, limit, after, fields.split(",") if fields else None
+        )
+        if current_user:
+            await record_user_search(current_user.id, search_id)
+        return direct_response(results)
     
     # Create a background task for the search
     task_id = await create_background_task("competitor_search", {
@@ -96,11 +118,19 @@ async def lookup_competitor(
     name_or_url: str = Query(..., description="Company name or website URL"),
     search_id: Optional[str] = None,
     offset: int = Query(default=0, ge=0),
-    limit: int = Query(default=6, ge=1)
+    limit: int = Query(default=6, ge=1),
+    after: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated fields to return"),
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     """Endpoint for looking up a specific competitor with background processing"""
     if search_id:
-        return await get_existing_search_results(search_id, offset, limit)
+        results = await get_existing_search_results(
+            search_id, offset, limit, after, fields.split(",") if fields else None
+        )
+        if current_user:
+            await record_user_search(current_user.id, search_id)
+        return direct_response(results)
     
     task_id = await create_background_task("competitor_lookup", {
         "name_or_url": name_or_url
@@ -113,7 +143,7 @@ async def lookup_competitor(
     }
 
 @router.get("/search/status/{task_id}")
-async def get_search_status(task_id: str):
+async def get_search_status(task_id: str, current_user: Optional[User] = Depends(get_optional_user)):
     """Check the status of a search task"""
     task_data = await get_task_status(task_id)
     if not task_data:
@@ -124,19 +154,81 @@ async def get_search_status(task_id: str):
     }
     
     if task_data["status"] == TaskStatus.COMPLETED:
-        response["result"] = task_data["result"]
-        response["search_id"] = task_data["result"]["search_id"]
+        search_id = task_data.get("search_id")
+        if search_id:
+            response["result"] = await get_search_result(search_id)
+        else:
+            # Records written before task records only held a search reference
+            response["result"] = task_data.get("result") or {}
+            search_id = response["result"].get("search_id")
+        response["search_id"] = search_id
+        if current_user and search_id:
+            await record_user_search(current_user.id, search_id)
     elif task_data["status"] == TaskStatus.FAILED:
-        response["error"] = task_data["error"]
+        response["error"] = task_data.get("error")
+    else:
+        # Competitors streamed so far while the search is still running
+        partial = await get_partial_results(task_id)
+        response["competitors"] = partial
+        response["progress"] = {
+            "received": len(partial),
+            "expected": EXPECTED_COMPETITORS
+        }
     
-    return response
+    return direct_response(response)
+
+@router.get("/search/cache/stats")
+async def search_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit rate, evictions and size of the search result cache"""
+    return await get_search_cache_stats()
+
+@router.get("/search/events/{task_id}")
+async def stream_search_status(task_id: str):
+    """Push status transitions and streamed competitors of a search task (SSE)"""
+    task_data = await get_task_status(task_id)
+    if not task_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return StreamingResponse(
+        stream_task_events(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{competitor_id}/insights", response_model=CompetitorInsights)
 async def get_competitor_insights(
-        competitor_id: str, current_user: User = Depends(get_current_user)
+        competitor_id: str,
+        response: Response,
+        background_tasks: BackgroundTasks,
+        if_none_match: Optional[str] = Header(default=None),
+        current_user: User = Depends(get_current_user)
 ):
     competitor = await get_competitors(current_user.id, competitor_id)
     if not competitor:
         raise HTTPException(status_code=404, detail="Competitor not found")
-    insights = await generate_competitor_insights(competitor)
+    insights, etag = await get_competitor_insights_cached(competitor_id, competitor, background_tasks)
+    etag = f'"{etag}"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
     return CompetitorInsights(competitor_id=competitor_id, insights=insights)
+
+@router.post("/insights/batch", response_model=List[BatchInsightsItem])
+async def get_batch_competitor_insights(
+        request: BatchInsightsRequest, current_user: User = Depends(get_current_user)
+):
+    """Insights for a list of competitors and/or every competitor of a search.
+
+    Covers the user's saved competitors and the results of searches they ran;
+    competitors that are missing or fail get an item with an error.
+    """
+    if not request.competitor_ids and not request.search_id:
+        raise HTTPException(status_code=400, detail="Provide competitor_ids or a search_id")
+    docs = await load_competitors_for_insights(current_user.id, request.competitor_ids, request.search_id)
+    if not docs:
+        raise HTTPException(status_code=404, detail="Competitor not found")
+    items = await get_batch_insights(docs)
+    for competitor_id in dict.fromkeys(request.competitor_ids):
+        if str(competitor_document_id(competitor_id)) not in docs:
+            items.append(BatchInsightsItem(competitor_id=competitor_id, error="Competitor not found"))
+    return items
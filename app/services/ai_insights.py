@@ -1,12 +1,21 @@
-from app.models.competitor import Competitor, CompetitorList, CompetitorBaseList, SingleCompetitorSearchResult
+from app.models.competitor import Competitor, CompetitorList, CompetitorBase, CompetitorBaseList, SingleCompetitorSearch, SingleCompetitorSearchResult
 from app.utils.data_scraper import scrape_competitor_data, scrape_logo
-from ai_integrations.chat_request import send_openai_request, find_competitors_openai, lookup_competitor_openai
-from typing import List
+from ai_integrations.chat_request import send_openai_request, find_competitors_openai, lookup_competitor_openai, stream_competitors_openai, batch_insights_openai
+from typing import List, Callable, Optional, Any, Dict, Tuple, Awaitable
 import asyncio
 
-async def generate_competitor_insights(competitor: Competitor) -> list[str]:
+# Number of competitors the search prompts ask for
+EXPECTED_COMPETITORS = 12
+
+# Batch insights prompts are packed up to this many estimated prompt tokens
+INSIGHTS_BATCH_TOKEN_BUDGET = 6000
+INSIGHTS_BATCH_MAX_COMPETITORS = 8
+INSIGHTS_OUTPUT_TOKENS_PER_COMPETITOR = 300
+
+async def generate_competitor_insights(competitor: Competitor, scraped_data: Optional[str] = None) -> list[str]:
     # Scrape additional data about the competitor
-    scraped_data = await scrape_competitor_data(competitor.website)
+    if scraped_data is None:
+        scraped_data = await scrape_competitor_data(competitor.website)
     
     # Prepare the prompt for OpenAI
     prompt = f"""
@@ -15,7 +24,7 @@ async def generate_competitor_insights(competitor: Competitor) -> list[str]:
     Company: {competitor.name}
     Business Type: {competitor.business_type}
     Location: {competitor.location}
-    Revenue: {competitor.revenue}
+    Revenue: {competitor.revenue_range}
     Target Market: {competitor.target_market}
     Description: {competitor.description}
     
@@ -26,34 +35,107 @@ async def generate_competitor_insights(competitor: Competitor) -> list[str]:
     """
     
     # Get insights from OpenAI
-    response = send_openai_request(prompt)
+    response = await send_openai_request(prompt)
     
     # Parse the response into a list of insights
     insights = response.split('\n')
-    insxights = [insight.strip() for insight in insights if insight.strip()]
+    insights = [insight.strip() for insight in insights if insight.strip()]
     
     return insights[:5]  # Return up to 5 insights
 
 
-async def find_competitors_ai(business_description: str, location: str) -> CompetitorList:
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate, about four characters per token"""
+    return len(text) // 4 + 1
+
+def competitor_insights_section(competitor_id: str, competitor: Competitor, scraped_data: str) -> str:
+    return f"""
+    Competitor ID: {competitor_id}
+    Company: {competitor.name}
+    Business Type: {competitor.business_type}
+    Location: {competitor.location}
+    Revenue: {competitor.revenue_range}
+    Target Market: {competitor.target_market}
+    Description: {competitor.description}
+    Additional scraped data:
+    {scraped_data}
+    """
+
+def pack_insights_sections(sections: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+    """Group (competitor_id, section) pairs into prompts within the token budget"""
+    packs, current, current_tokens = [], [], 0
+    for competitor_id, section in sections:
+        tokens = estimate_tokens(section)
+        if current and (current_tokens + tokens > INSIGHTS_BATCH_TOKEN_BUDGET
+                        or len(current) >= INSIGHTS_BATCH_MAX_COMPETITORS):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append((competitor_id, section))
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+async def generate_batch_insights(pack: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """Generate 3-5 insights for each competitor of a pack with a single LLM call"""
     prompt = f"""
-        Given the following business description and location, identify the top 12 competitors:
+    Analyze each of the following competitors and provide 3-5 key insights per competitor
+    on their market position, strengths, weaknesses, and potential strategies.
+    Return one item per competitor, using its Competitor ID as competitor_id.
+    {"".join(section for _, section in pack)}
+    """
+    response = await batch_insights_openai(prompt, INSIGHTS_OUTPUT_TOKENS_PER_COMPETITOR * len(pack))
+    requested = {competitor_id for competitor_id, _ in pack}
+    return {
+        item.competitor_id: [insight.strip() for insight in item.insights if insight.strip()][:5]
+        for item in response.items if item.competitor_id in requested
+    }
+
+
+def find_competitors_prompt(business_description: str, location: str) -> str:
+    return f"""
+        Given the following business description and location, identify the top {EXPECTED_COMPETITORS} competitors:
         Business: {business_description}
         Location: {location}
 
         Return an empty string ("") in the logo field.
         """
-    response = await find_competitors_openai(prompt)
-    competitors = [Competitor(**comp.model_dump()) for comp in response.competitors]
-    return competitors
 
-async def lookup_competitor_ai(name_or_url: str) -> SingleCompetitorSearchResult:
-    prompt = f"""
-        Given the following name or website about a business, return the top 12 competitors of the business, including the business as the first item. Make sure to include the country(ies) in which the competitor operate, and instead of "global" for countries that operate globally, list the top 10 countries they operate in.
+def lookup_competitor_prompt(name_or_url: str) -> str:
+    return f"""
+        Given the following name or website about a business, return the top {EXPECTED_COMPETITORS} competitors of the business, including the business as the first item. Make sure to include the country(ies) in which the competitor operate, and instead of "global" for countries that operate globally, list the top 10 countries they operate in.
         Name or URL: {name_or_url}
 
         Return an empty string ("") in the logo field.
         """
+
+async def _stream_competitors(prompt: str, response_model, task_type: str, convert: Callable[[Any], Any],
+                              on_competitor: Callable[[Any, int], Awaitable[None]]) -> list:
+    """Collect streamed competitors, reporting each one as soon as it is validated"""
+    competitors = []
+    async for item in stream_competitors_openai(prompt, response_model, task_type):
+        competitor = convert(item)
+        competitors.append(competitor)
+        await on_competitor(competitor, len(competitors))
+    return competitors
+
+async def find_competitors_ai(business_description: str, location: str,
+                              on_competitor: Optional[Callable[[Competitor, int], Awaitable[None]]] = None) -> CompetitorList:
+    prompt = find_competitors_prompt(business_description, location)
+    if on_competitor:
+        return await _stream_competitors(
+            prompt, CompetitorBase, "competitor_search", lambda comp: Competitor(**comp.model_dump()), on_competitor
+        )
+    response = await find_competitors_openai(prompt)
+    competitors = [Competitor(**comp.model_dump()) for comp in response.competitors]
+    return competitors
+
+async def lookup_competitor_ai(name_or_url: str,
+                               on_competitor: Optional[Callable[[SingleCompetitorSearch, int], Awaitable[None]]] = None) -> SingleCompetitorSearchResult:
+    prompt = lookup_competitor_prompt(name_or_url)
+    if on_competitor:
+        return await _stream_competitors(
+            prompt, SingleCompetitorSearch, "competitor_lookup", lambda comp: comp, on_competitor
+        )
     response = await lookup_competitor_openai(prompt)
     return response.competitors
-
@@ -1,17 +1,22 @@
 from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from app.database import get_collection
 from app.config import settings
 from pydantic import EmailStr
 from app.services.token_service import verify_reset_token
 from app.models.user import UserCreate, UserInDB, User, TokenData, GoogleAuthData
+from app.services.user_cache import get_cached_user, cache_user, invalidate_cached_user
+from app.services.password_hashing import hash_password, verify_password
+from app.services.token_revocation import is_token_revoked
+from app.utils.metrics import current_user_seconds
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 async def create_user(user: UserCreate):
     users = get_collection("users")
@@ -25,7 +30,7 @@ async def create_user(user: UserCreate):
     if user.auth_provider == "email":
         if not user.password:
             raise HTTPException(status_code=400, detail="Password required for email registration")
-        hashed_password = pwd_context.hash(user.password)
+        hashed_password = await hash_password(user.password)
         user_dict["hashed_password"] = hashed_password
         user_dict.pop('password', None)
     
@@ -48,6 +53,7 @@ async def authenticate_google_user(google_data: GoogleAuthData) -> User:
                 "auth_provider": "google"
             }}
         )
+        await invalidate_cached_user(google_data.email)
         return User(**existing_user, id=str(existing_user["_id"]))
     
     # Create new user
@@ -62,18 +68,37 @@ async def authenticate_google_user(google_data: GoogleAuthData) -> User:
 async def authenticate_user(email: EmailStr, password: str):
     users = get_collection("users")
     user = await users.find_one({"email": email})
-    if not user or not pwd_context.verify(password, user["hashed_password"]):
+    if not user:
         return False
+    is_valid, new_hash = await verify_password(password, user.get("hashed_password"))
+    if not is_valid:
+        return False
+    if new_hash:
+        # Stored hash uses an old cost factor, upgrade it while we have the password
+        await users.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
     return User(**user, id=str(user["_id"]))
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    with current_user_seconds.time():
+        return await resolve_current_user(token)
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[User]:
+    """The authenticated user, or None for anonymous requests"""
+    if not token:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None
+
+async def resolve_current_user(token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -88,11 +113,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    jti = payload.get("jti")
+    if jti and await is_token_revoked(jti):
+        raise credentials_exception
+    cached_user = await get_cached_user(token_data.username)
+    if cached_user:
+        return cached_user
     users = get_collection("users")
     user = await users.find_one({"email": token_data.username})
     if user is None:
         raise credentials_exception
-    return User(**user, id=str(user["_id"]))
+    current_user = User(**user, id=str(user["_id"]))
+    await cache_user(current_user)
+    return current_user
 
 async def reset_password(email: EmailStr, otp: str, new_password: str):
     """Reset user password with OTP verification."""
@@ -107,7 +140,7 @@ async def reset_password(email: EmailStr, otp: str, new_password: str):
         )
     
     # Hash the new password
-    hashed_password = pwd_context.hash(new_password)
+    hashed_password = await hash_password(new_password)
     
     # Update the user's password
     result = await users.update_one(
@@ -121,4 +154,5 @@ async def reset_password(email: EmailStr, otp: str, new_password: str):
             detail="User not found"
         )
     
+    await invalidate_cached_user(email)
     return True
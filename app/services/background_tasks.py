@@ -1,9 +1,14 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, AsyncIterator, Set
+import asyncio
 import json
+import time
 from datetime import datetime
 from uuid import uuid4
-from app.database import redis_client
-from app.celery_app import celery_app
+from app.database import redis_async, redis_pubsub, get_collection
+from app.celery_app import celery_app, task_events_channel
+from app.services.singleflight import claim_search, release_search_async
+from app.services.search_cache import get_cached_search_async
+from app.utils.metrics import time_stage
 import logging
 from app.config import settings
 
@@ -15,6 +20,9 @@ class TaskStatus:
     COMPLETED = "completed"
     FAILED = "failed"
 
+TERMINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED)
+EVENT_KEEPALIVE_SECONDS = 15
+
 def get_redis_url_with_ssl():
     """Get Redis URL with SSL parameters if needed"""
     redis_url = settings.REDIS_URL
@@ -22,12 +30,47 @@ def get_redis_url_with_ssl():
         return f"{redis_url}?ssl_cert_reqs=CERT_NONE"
     return redis_url
 
+async def complete_from_cache(task_type: str, params: Dict[Any, Any], task_id: str) -> bool:
+    """Complete task_id from the search cache without enqueuing it.
+
+    Only used when the referenced search is still stored; returns False on a
+    miss so the caller enqueues the search.
+    """
+    try:
+        with time_stage(task_type, "cache_lookup"):
+            cached_result = await get_cached_search_async(task_type, params)
+            if not cached_result or not await get_collection("competitors").count_documents(
+                    {"search_id": cached_result["search_id"]}, limit=1):
+                return False
+        payload = json.dumps({
+            "status": TaskStatus.COMPLETED,
+            "updated_at": str(datetime.utcnow()),
+            "search_id": cached_result["search_id"],
+            "total": cached_result["total"],
+        })
+        pipe = redis_async.pipeline(transaction=False)
+        pipe.set(f"task:{task_id}", payload, ex=3600)  # 1 hour expiration
+        pipe.publish(task_events_channel(task_id), payload)
+        await pipe.execute()
+        logger.info(f"Search cache hit for task {task_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Error completing task {task_id} from the search cache: {str(e)}")
+        return False
+
 async def create_background_task(task_type: str, params: Dict[Any, Any]) -> str:
-    """Create a new background task and return its ID."""
+    """Create a new background task and return its ID.
+
+    Cached searches are completed right away without going through the
+    queue. Identical searches already in flight are coalesced: the caller
+    gets the task_id of the running search instead of a new one.
+    """
     try:
         task_id = str(uuid4())
+        if await complete_from_cache(task_type, params, task_id):
+            return task_id
         
-        # Store initial task status in Redis
+        # Initial task status, written to Redis together with the claim
         task_data = {
             "id": task_id,
             "type": task_type,
@@ -35,18 +78,25 @@ async def create_background_task(task_type: str, params: Dict[Any, Any]) -> str:
             "created_at": str(datetime.utcnow()),
         }
         
-        redis_client.set(
-            f"task:{task_id}",
+        is_leader, leader_id = await claim_search(
+            task_type, params, task_id,
             json.dumps(task_data),
-            ex=3600  # 1 hour expiration
+            3600  # 1 hour expiration
         )
+        if not is_leader:
+            logger.info(f"Attaching {task_type} request to in-flight task {leader_id}")
+            return leader_id
         
         # Launch Celery task
-        celery_app.send_task(
-            'process_competitor_search',
-            args=[task_type, params, task_id],
-            task_id=task_id
-        )
+        try:
+            celery_app.send_task(
+                'process_competitor_search',
+                args=[task_type, params, task_id, time.time()],
+                task_id=task_id
+            )
+        except Exception:
+            await release_search_async(task_type, params, task_id)
+            raise
         
         return task_id
     except Exception as e:
@@ -56,10 +106,133 @@ async def create_background_task(task_type: str, params: Dict[Any, Any]) -> str:
 async def get_task_status(task_id: str) -> Optional[Dict[str, Any]]:
     """Get the current status of a task."""
     try:
-        task_data = redis_client.get(f"task:{task_id}")
+        task_data = await redis_async.get(f"task:{task_id}")
         if not task_data:
             return None
         return json.loads(task_data)
     except Exception as e:
         logger.error(f"Error getting task status: {str(e)}")
         return None
+
+async def get_partial_results(task_id: str) -> List[Dict[str, Any]]:
+    """Get the competitors streamed so far for a running task."""
+    try:
+        partial = await redis_async.lrange(f"task:{task_id}:partial", 0, -1)
+        return [json.loads(competitor) for competitor in partial]
+    except Exception as e:
+        logger.error(f"Error getting partial results: {str(e)}")
+        return []
+
+def format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class TaskEventHub:
+    """One pub/sub connection per process, fanning task events out to the local streams.
+
+    Each open event stream gets an in-process queue instead of its own Redis
+    connection, so the number of streams is not bounded by a connection pool.
+    """
+
+    def __init__(self):
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        channel = task_events_channel(task_id)
+        queue = asyncio.Queue()
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = redis_pubsub.pubsub()
+            if channel not in self._queues:
+                await self._pubsub.subscribe(channel)
+            self._queues.setdefault(channel, set()).add(queue)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        channel = task_events_channel(task_id)
+        async with self._lock:
+            queues = self._queues.get(channel)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._queues[channel]
+                try:
+                    await self._pubsub.unsubscribe(channel)
+                except Exception as e:
+                    logger.error(f"Error unsubscribing from {channel}: {str(e)}")
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task event subscription lost: {str(e)}")
+                await self._reset()
+                return
+            if message:
+                for queue in self._queues.get(message["channel"], ()):
+                    queue.put_nowait(message["data"])
+
+    async def _reset(self):
+        """Drop the broken connection; open streams are told with a None event"""
+        async with self._lock:
+            for queues in self._queues.values():
+                for queue in queues:
+                    queue.put_nowait(None)
+            self._queues = {}
+            pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            await pubsub.aclose()
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+        await self._reset()
+
+
+task_event_hub = TaskEventHub()
+
+async def stream_task_events(task_id: str) -> AsyncIterator[str]:
+    """Yield SSE messages for a task until it completes or fails.
+
+    Subscribes before reading the current status so no transition published
+    in between is missed.
+    """
+    queue = await task_event_hub.subscribe(task_id)
+    try:
+        task_data = await get_task_status(task_id)
+        if task_data:
+            yield format_sse_event("status", task_data)
+            if task_data["status"] in TERMINAL_STATUSES:
+                return
+        
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            if data is None:
+                raise ConnectionError("Task event subscription lost")
+            
+            event_data = json.loads(data)
+            event = "competitor" if "competitor" in event_data else "status"
+            yield format_sse_event(event, event_data)
+            if event == "status" and event_data["status"] in TERMINAL_STATUSES:
+                return
+    except Exception as e:
+        logger.error(f"Error streaming events for task {task_id}: {str(e)}")
+        yield format_sse_event("error", {"error": "Event stream interrupted"})
+    finally:
+        await task_event_hub.unsubscribe(task_id, queue)
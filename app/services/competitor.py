@@ -1,14 +1,27 @@
 from app.models.competitor import CompetitorCreate, CompetitorUpdate, Competitor, CompetitorList, CompetitorBaseList, SingleCompetitorSearchResult, SingleCompetitorSearch
-from fastapi import BackgroundTasks
-from app.database import get_collection, redis_client
+from fastapi import BackgroundTasks, HTTPException
+from app.database import get_collection, redis_async
 from bson import ObjectId
 from typing import List, Optional, Callable, Any, Union
 from uuid import uuid4
+from datetime import datetime
 from app.services.ai_insights import (
     find_competitors_ai,              
     lookup_competitor_ai,             
 )
 from app.services.background_tasks import TaskStatus
+from app.services.search_cache import canonicalize_text
+from app.utils.metrics import record_cache
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields a client may ask for when paging through search results
+SEARCH_RESULT_FIELDS = set(SingleCompetitorSearch.model_fields) | {"search_id", "user_id"}
+# Search responses skip the response model, so internal fields are projected out
+SEARCH_RESULT_PROJECTION = {"insights_cache": 0}
+SEARCH_TOTAL_TTL = 3600  # stored searches don't change size
 
 
 async def create_competitor(competitor: CompetitorCreate, user_id: str):
@@ -39,21 +52,52 @@ async def insert_competitors(competitors: CompetitorList):
         
     return inserted_competitors
 
-async def get_existing_search_results(search_id: str, offset: int, limit: int):
-    """Helper function to get existing search results"""
-    competitor_collection = get_collection("competitors")
-    competitors = await competitor_collection.find(
-        {"search_id": search_id}
-    ).to_list(None)
+async def get_search_total(search_id: str) -> int:
+    """Number of competitors stored for a search, cached in Redis"""
+    total_key = f"search_total:{search_id}"
+    try:
+        cached_total = await redis_async.get(total_key)
+        record_cache("search_total", "miss" if cached_total is None else "hit")
+        if cached_total is not None:
+            return int(cached_total)
+    except Exception as e:
+        logger.error(f"Error reading cached search total: {str(e)}")
     
-    if not competitors:
+    total = await get_collection("competitors").count_documents({"search_id": search_id})
+    if total:
+        try:
+            await redis_async.set(total_key, total, ex=SEARCH_TOTAL_TTL)
+        except Exception as e:
+            logger.error(f"Error caching search total: {str(e)}")
+    return total
+
+async def get_existing_search_results(search_id: str, offset: int, limit: int,
+                                      after: Optional[str] = None, fields: Optional[List[str]] = None):
+    """Helper function to get existing search results.
+
+    Pages are read in _id order. Passing the previous page's next_cursor as
+    `after` uses keyset pagination instead of offset; `fields` restricts the
+    returned fields.
+    """
+    total = await get_search_total(search_id)
+    if not total:
         raise HTTPException(
             status_code=404,
             detail=f"No results found for search_id: {search_id}"
         )
     
-    total = len(competitors)
-    paginated = competitors[offset:offset + limit]
+    query = {"search_id": search_id}
+    if after:
+        query["_id"] = {"$gt": after}
+    projection = SEARCH_RESULT_PROJECTION
+    if fields:
+        projection = {field: 1 for field in fields if field in SEARCH_RESULT_FIELDS} or projection
+    
+    competitor_collection = get_collection("competitors")
+    cursor = competitor_collection.find(query, projection).sort("_id", 1)
+    if not after:
+        cursor = cursor.skip(offset)
+    paginated = await cursor.limit(limit).to_list(limit)
     
     return {
         "competitors": paginated,
@@ -61,9 +105,31 @@ async def get_existing_search_results(search_id: str, offset: int, limit: int):
         "offset": offset,
         "limit": limit,
         "search_id": search_id,
+        "next_cursor": paginated[-1]["_id"] if len(paginated) == limit else None,
         "status": TaskStatus.COMPLETED
     }
 
+async def get_search_result(search_id: str) -> dict:
+    """Read-through for completed tasks: the full result of a stored search"""
+    competitor_collection = get_collection("competitors")
+    competitors = await competitor_collection.find(
+        {"search_id": search_id}, SEARCH_RESULT_PROJECTION
+    ).sort("_id", 1).to_list(None)
+    return {
+        "competitors": competitors,
+        "search_id": search_id,
+        "total": len(competitors)
+    }
+
+async def record_user_search(user_id: str, search_id: str):
+    """Remember that a user was handed the results of a search"""
+    user_searches = get_collection("user_searches")
+    await user_searches.update_one(
+        {"user_id": user_id, "search_id": search_id},
+        {"$setOnInsert": {"created_at": datetime.utcnow()}},
+        upsert=True
+    )
+
 async def get_competitors(user_id: str, competitor_id: Optional[str] = None):
     competitors = get_collection("competitors")
     query = {"user_id": user_id}
@@ -91,12 +157,30 @@ async def delete_competitor(competitor_id: str, user_id: str):
     result = await competitors.delete_one({"_id": ObjectId(competitor_id), "user_id": user_id})
     return result.deleted_count > 0
 
-async def search_competitors(business_type: str, location: str) -> List[Competitor]:
-    competitors = get_collection("competitors")
-    query = {
-        "business_type": {"$regex": business_type, "$options": "i"},
-        "location": {"$regex": location, "$options": "i"}
-    }
-    cursor = competitors.find(query)
-    return [Competitor(**comp, id=str(comp["_id"])) async for comp in cursor]
+async def search_competitors(business_type: str, location: str, offset: int = 0, limit: int = 20) -> CompetitorList:
+    """Full-text search over stored competitors in a location, ranked by relevance.
 
+    The business type is matched through the competitor_text index; the
+    location must match as well, as a case-insensitive substring.
+    """
+    competitors = get_collection("competitors")
+    query = {}
+    if location.strip():
+        query["location"] = {"$regex": re.escape(location.strip()), "$options": "i"}
+    terms = canonicalize_text(business_type)
+    if terms:
+        query["$text"] = {"$search": terms}
+    
+    total = await competitors.count_documents(query)
+    if terms:
+        cursor = competitors.find(query, {"score": {"$meta": "textScore"}}).sort([("score", {"$meta": "textScore"})])
+    else:
+        cursor = competitors.find(query).sort("_id", 1)
+    cursor = cursor.skip(offset).limit(limit)
+    return CompetitorList(
+        total=total,
+        offset=offset,
+        limit=limit,
+        search_id="",
+        competitors=[Competitor(**comp, id=str(comp["_id"])) async for comp in cursor]
+    )
@@ -0,0 +1,218 @@
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from uuid import uuid4
+from typing import Optional, Tuple, List, Dict, Any
+from bson import ObjectId
+from fastapi import BackgroundTasks
+from app.database import get_collection, redis_async
+from app.celery_app import celery_app
+from app.config import settings
+from app.models.competitor import Competitor, BatchInsightsItem
+from app.services.ai_insights import (
+    generate_competitor_insights,
+    competitor_insights_section,
+    pack_insights_sections,
+    generate_batch_insights,
+)
+from app.utils.data_scraper import scrape_competitor_data
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the insights prompt or parsing changes to invalidate stored insights
+INSIGHTS_VERSION = 1
+INSIGHTS_FIELDS = ("name", "business_type", "location", "revenue_range", "target_market", "description", "website")
+BATCH_SCRAPE_CONCURRENCY = 10
+REFRESH_LOCK_TTL = 120  # seconds
+
+# Delete the lock only if it still holds our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def competitor_document_id(competitor_id: str):
+    """Saved competitors use ObjectIds, AI search results use uuid strings"""
+    return ObjectId(competitor_id) if ObjectId.is_valid(competitor_id) else competitor_id
+
+def competitor_fields_hash(competitor: Competitor) -> str:
+    fields = {field: getattr(competitor, field, None) for field in INSIGHTS_FIELDS}
+    payload = json.dumps({"version": INSIGHTS_VERSION, "fields": fields}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def insights_etag(fields_hash: str, scraped_data: str) -> str:
+    """Version of a set of insights: the competitor fields plus the scraped content"""
+    return hashlib.sha256(f"{fields_hash}:{scraped_data}".encode()).hexdigest()[:32]
+
+async def load_cached_insights(competitor_id: str) -> Optional[Dict[str, Any]]:
+    competitors = get_collection("competitors")
+    doc = await competitors.find_one({"_id": competitor_document_id(competitor_id)}, {"insights_cache": 1})
+    return doc.get("insights_cache") if doc else None
+
+async def store_insights(competitor_id: str, fields_hash: str, etag: str, insights: List[str]):
+    competitors = get_collection("competitors")
+    await competitors.update_one(
+        {"_id": competitor_document_id(competitor_id)},
+        {"$set": {"insights_cache": {
+            "version": INSIGHTS_VERSION,
+            "fields_hash": fields_hash,
+            "etag": etag,
+            "insights": insights,
+            "generated_at": datetime.utcnow(),
+        }}}
+    )
+
+async def build_insights(competitor_id: str, competitor: Competitor,
+                         cached: Optional[Dict[str, Any]] = None) -> Tuple[List[str], str]:
+    """Scrape and regenerate insights, skipping the LLM when nothing changed"""
+    fields_hash = competitor_fields_hash(competitor)
+    scraped_data = await scrape_competitor_data(competitor.website)
+    etag = insights_etag(fields_hash, scraped_data)
+    if cached and cached.get("etag") == etag:
+        insights = cached["insights"]
+    else:
+        insights = await generate_competitor_insights(competitor, scraped_data)
+    await store_insights(competitor_id, fields_hash, etag, insights)
+    return insights, etag
+
+async def refresh_insights(competitor_id: str, competitor: Competitor, cached: Dict[str, Any]):
+    """Background revalidation of stale insights, one refresh per competitor at a time"""
+    lock_key = f"insights_refresh:{competitor_id}"
+    token = str(uuid4())
+    if not await redis_async.set(lock_key, token, nx=True, ex=REFRESH_LOCK_TTL):
+        return
+    try:
+        await build_insights(competitor_id, competitor, cached)
+    except Exception as e:
+        logger.error(f"Error refreshing insights for competitor {competitor_id}: {str(e)}")
+    finally:
+        # Only release our own lock, it may have expired and been taken over
+        try:
+            await redis_async.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.error(f"Error releasing insights refresh lock for {competitor_id}: {str(e)}")
+
+async def refresh_insights_by_id(competitor_id: str):
+    """Entry point of the refresh_competitor_insights Celery task"""
+    competitors = get_collection("competitors")
+    doc = await competitors.find_one({"_id": competitor_document_id(competitor_id)})
+    if doc:
+        await refresh_insights(competitor_id, Competitor(**doc), doc.get("insights_cache"))
+
+async def get_competitor_insights_cached(competitor_id: str, competitor: Competitor,
+                                         background_tasks: BackgroundTasks) -> Tuple[List[str], str]:
+    """Return (insights, etag) for a competitor.
+
+    Fresh stored insights are returned as is. Stale ones (older than
+    INSIGHTS_TTL_SECONDS but within INSIGHTS_STALE_SECONDS more) are returned
+    while a refresh runs on the insights queue. Otherwise they are generated now.
+    """
+    cached = await load_cached_insights(competitor_id)
+    if cached and cached.get("fields_hash") == competitor_fields_hash(competitor) \
+            and cached.get("version") == INSIGHTS_VERSION:
+        age = datetime.utcnow() - cached["generated_at"]
+        if age < timedelta(seconds=settings.INSIGHTS_TTL_SECONDS):
+            record_cache("insights", "hit")
+            return cached["insights"], cached["etag"]
+        if age < timedelta(seconds=settings.INSIGHTS_TTL_SECONDS + settings.INSIGHTS_STALE_SECONDS):
+            record_cache("insights", "stale")
+            # Enqueue after the response is sent
+            background_tasks.add_task(celery_app.send_task, 'refresh_competitor_insights', args=[competitor_id])
+            return cached["insights"], cached["etag"]
+    record_cache("insights", "miss")
+    return await build_insights(competitor_id, competitor, cached)
+
+def is_fresh(cached: Optional[Dict[str, Any]], competitor: Competitor) -> bool:
+    return bool(cached) and cached.get("version") == INSIGHTS_VERSION \
+        and cached.get("fields_hash") == competitor_fields_hash(competitor) \
+        and datetime.utcnow() - cached["generated_at"] < timedelta(seconds=settings.INSIGHTS_TTL_SECONDS)
+
+async def load_competitors_for_insights(user_id: str, competitor_ids: List[str],
+                                        search_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Load competitors by id and/or all competitors of a search.
+
+    Only the user's saved competitors and the results of searches they were
+    handed (see record_user_search) are returned.
+    """
+    filters = []
+    if competitor_ids:
+        filters.append({"_id": {"$in": [competitor_document_id(competitor_id) for competitor_id in competitor_ids]}})
+    if search_id:
+        filters.append({"search_id": search_id})
+    if not filters:
+        return {}
+    competitors = get_collection("competitors")
+    docs = {str(doc["_id"]): doc async for doc in competitors.find({"$or": filters})}
+
+    search_ids = list({doc["search_id"] for doc in docs.values() if doc.get("search_id")})
+    owned_searches = set()
+    if search_ids:
+        user_searches = get_collection("user_searches")
+        cursor = user_searches.find({"user_id": user_id, "search_id": {"$in": search_ids}}, {"search_id": 1})
+        owned_searches = {doc["search_id"] async for doc in cursor}
+    return {
+        competitor_id: doc for competitor_id, doc in docs.items()
+        if doc.get("user_id") == user_id or doc.get("search_id") in owned_searches
+    }
+
+async def get_batch_insights(docs: Dict[str, Dict[str, Any]]) -> List[BatchInsightsItem]:
+    """Insights for many competitors at once.
+
+    Fresh stored insights are reused. For the rest, each distinct website is
+    scraped once, concurrently, and competitors are packed into as few LLM
+    prompts as the token budget allows. Competitors whose insights could not
+    be generated are returned with an error instead.
+    """
+    results = {}
+    pending = {}
+    for competitor_id, doc in docs.items():
+        competitor = Competitor(**doc)
+        cached = doc.get("insights_cache")
+        if is_fresh(cached, competitor):
+            results[competitor_id] = cached["insights"]
+        else:
+            pending[competitor_id] = competitor
+    record_cache("insights", "hit", len(results))
+    record_cache("insights", "miss", len(pending))
+
+    if pending:
+        semaphore = asyncio.Semaphore(BATCH_SCRAPE_CONCURRENCY)
+
+        async def scrape(website):
+            async with semaphore:
+                return await scrape_competitor_data(website)
+
+        websites = sorted({competitor.website or "" for competitor in pending.values()})
+        scraped = dict(zip(websites, await asyncio.gather(*(scrape(website) for website in websites))))
+
+        sections = [
+            (competitor_id, competitor_insights_section(competitor_id, competitor, scraped[competitor.website or ""]))
+            for competitor_id, competitor in pending.items()
+        ]
+        packs = pack_insights_sections(sections)
+        generated = {}
+        for pack_result in await asyncio.gather(*(generate_batch_insights(pack) for pack in packs),
+                                                return_exceptions=True):
+            if isinstance(pack_result, Exception):
+                logger.error(f"Error generating batch insights: {str(pack_result)}")
+                continue
+            generated.update(pack_result)
+
+        for competitor_id, insights in generated.items():
+            competitor = pending[competitor_id]
+            fields_hash = competitor_fields_hash(competitor)
+            etag = insights_etag(fields_hash, scraped[competitor.website or ""])
+            await store_insights(competitor_id, fields_hash, etag, insights)
+            results[competitor_id] = insights
+
+    return [
+        BatchInsightsItem(competitor_id=competitor_id, insights=results[competitor_id])
+        if competitor_id in results
+        else BatchInsightsItem(competitor_id=competitor_id, error="Insights could not be generated")
+        for competitor_id in docs
+    ]
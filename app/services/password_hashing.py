@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hashes made with a different cost factor are flagged for rehash on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL while hashing, so a thread pool runs hashes in
+# parallel without stalling the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+pending_operations = 0
+
+async def run_password_operation(func, *args):
+    """Run a bcrypt operation on the password pool, rejecting work past the queue bound"""
+    global pending_operations
+    if pending_operations >= settings.PASSWORD_HASH_MAX_PENDING:
+        logger.warning("Password hashing queue is full, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    pending_operations += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        pending_operations -= 1
+
+async def hash_password(password: str) -> str:
+    return await run_password_operation(pwd_context.hash, password)
+
+async def verify_password(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning (is_valid, new_hash).
+
+    new_hash is set when the stored hash uses an outdated cost factor and
+    should be replaced.
+    """
+    if not hashed_password:
+        return False, None
+    return await run_password_operation(pwd_context.verify_and_update, password, hashed_password)
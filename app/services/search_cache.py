@@ -0,0 +1,126 @@
+import json
+import time
+import hashlib
+import logging
+import string
+import unicodedata
+from typing import Dict, Any, Optional
+from app.database import redis_client, redis_async
+from app.config import settings
+from app.utils.url_utils import looks_like_url, registrable_domain
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "search_cache:"
+CACHE_INDEX_KEY = "search_cache_index"  # sorted set of cache keys scored by last access
+CACHE_STATS_KEY = "search_cache_stats"
+
+_PUNCTUATION_TABLE = str.maketrans({char: " " for char in string.punctuation})
+
+def canonicalize_text(value: str) -> str:
+    """Fold case, punctuation and whitespace so equivalent inputs compare equal"""
+    value = unicodedata.normalize("NFKC", value or "").casefold()
+    value = value.translate(_PUNCTUATION_TABLE)
+    return " ".join(value.split())
+
+def canonical_search_params(task_type: str, params: Dict[str, Any]) -> Dict[str, str]:
+    """Build the canonical form of a search request"""
+    if task_type == "competitor_search":
+        return {
+            "business_description": canonicalize_text(params["business_description"]),
+            "location": canonicalize_text(params["location"]),
+        }
+    name_or_url = params["name_or_url"]
+    if looks_like_url(name_or_url):
+        return {"domain": registrable_domain(name_or_url)}
+    return {"name": canonicalize_text(name_or_url)}
+
+def make_search_key(task_type: str, params: Dict[str, Any]) -> str:
+    """Stable hash of the canonical search request"""
+    canonical = json.dumps(
+        {"type": task_type, "params": canonical_search_params(task_type, params)},
+        sort_keys=True
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def get_cached_search(task_type: str, params: Dict[str, Any], record_stats: bool = True) -> Optional[Dict[str, Any]]:
+    """Return the cached search reference, counting the hit or miss.
+
+    record_stats=False is for the worker-side re-check of a lookup already
+    counted by get_cached_search_async.
+    """
+    if not settings.SEARCH_CACHE_ENABLED or not redis_client:
+        return None
+    cache_key = f"{CACHE_KEY_PREFIX}{make_search_key(task_type, params)}"
+    try:
+        cached = redis_client.get(cache_key)
+        pipe = redis_client.pipeline(transaction=False)
+        if record_stats:
+            record_cache("search", "hit" if cached else "miss")
+            pipe.hincrby(CACHE_STATS_KEY, "hits" if cached else "misses", 1)
+        if cached:
+            pipe.zadd(CACHE_INDEX_KEY, {cache_key: time.time()})
+        pipe.execute()
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.error(f"Error reading search cache: {str(e)}")
+        return None
+
+async def get_cached_search_async(task_type: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """get_cached_search for async code, used before a search is enqueued"""
+    if not settings.SEARCH_CACHE_ENABLED or not redis_async:
+        return None
+    cache_key = f"{CACHE_KEY_PREFIX}{make_search_key(task_type, params)}"
+    try:
+        cached = await redis_async.get(cache_key)
+        pipe = redis_async.pipeline(transaction=False)
+        record_cache("search", "hit" if cached else "miss")
+        pipe.hincrby(CACHE_STATS_KEY, "hits" if cached else "misses", 1)
+        if cached:
+            pipe.zadd(CACHE_INDEX_KEY, {cache_key: time.time()})
+        await pipe.execute()
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.error(f"Error reading search cache: {str(e)}")
+        return None
+
+def cache_search_result(task_type: str, params: Dict[str, Any], result: Dict[str, Any]):
+    """Store a reference ({search_id, total}) to a stored search result and evict
+    the least recently used entries over the size bound"""
+    if not settings.SEARCH_CACHE_ENABLED or not redis_client or not result.get("total"):
+        return
+    cache_key = f"{CACHE_KEY_PREFIX}{make_search_key(task_type, params)}"
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(cache_key, json.dumps(result), ex=settings.SEARCH_CACHE_TTL_SECONDS)
+        pipe.zadd(CACHE_INDEX_KEY, {cache_key: time.time()})
+        pipe.zcard(CACHE_INDEX_KEY)
+        size = pipe.execute()[-1]
+
+        overflow = size - settings.SEARCH_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = redis_client.zrange(CACHE_INDEX_KEY, 0, overflow - 1)
+            if evicted:
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.delete(*evicted)
+                pipe.zrem(CACHE_INDEX_KEY, *evicted)
+                pipe.hincrby(CACHE_STATS_KEY, "evictions", len(evicted))
+                pipe.execute()
+    except Exception as e:
+        logger.error(f"Error writing search cache: {str(e)}")
+
+async def get_search_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss/eviction counters (shared by all workers), hit rate and size"""
+    stats = {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "hit_rate": 0.0}
+    if not redis_async:
+        return stats
+    try:
+        counters = await redis_async.hgetall(CACHE_STATS_KEY)
+        stats.update({name: int(value) for name, value in counters.items()})
+        stats["size"] = await redis_async.zcard(CACHE_INDEX_KEY)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    except Exception as e:
+        logger.error(f"Error reading search cache stats: {str(e)}")
+    return stats
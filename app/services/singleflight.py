@@ -0,0 +1,84 @@
+import logging
+from app.database import redis_client, redis_async
+from app.services.search_cache import make_search_key
+
+logger = logging.getLogger(__name__)
+
+INFLIGHT_KEY_PREFIX = "inflight_search:"
+CLAIM_ATTEMPTS = 3
+
+# Attach to the running leader if its task record is still alive, otherwise
+# claim the search and write the new task record in the same atomic step.
+# KEYS: in-flight key, task record of the leader the caller saw (its own
+# record's key when there was none), the new task record. ARGV[5] is the
+# leader the caller saw; if it changed meanwhile the caller retries (-1).
+CLAIM_SCRIPT = """
+local leader = redis.call('GET', KEYS[1]) or ''
+if leader ~= ARGV[5] then
+    return {-1, leader}
+end
+if leader ~= '' and redis.call('EXISTS', KEYS[2]) == 1 then
+    return {0, leader}
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SET', KEYS[3], ARGV[3], 'EX', ARGV[4])
+return {1, ARGV[1]}
+"""
+
+# Extend the claim only while task_id still owns it
+REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def inflight_key(task_type: str, params: dict) -> str:
+    return f"{INFLIGHT_KEY_PREFIX}{make_search_key(task_type, params)}"
+
+async def claim_search(task_type: str, params: dict, task_id: str, task_record: str, task_ttl: int):
+    """Claim a search for task_id or return the task_id already running it.
+
+    The claim lives as long as the task record, so it can't expire while the
+    task waits in a backlog; refresh_search shortens it once the task starts.
+    Returns a (is_leader, task_id) tuple.
+    """
+    key = inflight_key(task_type, params)
+    for _ in range(CLAIM_ATTEMPTS):
+        seen_leader = await redis_async.get(key) or ""
+        leader_record = f"task:{seen_leader}" if seen_leader else f"task:{task_id}"
+        status, leader_id = await redis_async.eval(
+            CLAIM_SCRIPT, 3, key, leader_record, f"task:{task_id}",
+            task_id, task_ttl, task_record, task_ttl, seen_leader
+        )
+        if status != -1:
+            return bool(status), leader_id
+    raise RuntimeError(f"Could not claim in-flight search for task {task_id}")
+
+def refresh_search(task_type: str, params: dict, task_id: str, ttl: int):
+    """Extend task_id's claim to cover its run, called when the task starts"""
+    try:
+        redis_client.eval(REFRESH_SCRIPT, 1, inflight_key(task_type, params), task_id, ttl)
+    except Exception as e:
+        logger.error(f"Error refreshing in-flight search for task {task_id}: {str(e)}")
+
+async def release_search_async(task_type: str, params: dict, task_id: str):
+    """Release the in-flight claim if task_id still owns it, from async code"""
+    try:
+        await redis_async.eval(RELEASE_SCRIPT, 1, inflight_key(task_type, params), task_id)
+    except Exception as e:
+        logger.error(f"Error releasing in-flight search for task {task_id}: {str(e)}")
+
+def release_search(task_type: str, params: dict, task_id: str):
+    """Release the in-flight claim if task_id still owns it"""
+    try:
+        redis_client.eval(RELEASE_SCRIPT, 1, inflight_key(task_type, params), task_id)
+    except Exception as e:
+        logger.error(f"Error releasing in-flight search for task {task_id}: {str(e)}")
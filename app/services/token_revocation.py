@@ -0,0 +1,131 @@
+import time
+import asyncio
+import logging
+from typing import List
+from app.database import redis_async, redis_pubsub
+from app.config import settings
+from app.utils.bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY_PREFIX = "revoked_jti:"
+REVOCATION_CHANNEL = "token_revocations"
+
+
+class RevocationFilter:
+    """Per-process Bloom filter of revoked token IDs (jti).
+
+    Kept in sync through Redis pub/sub and rebuilt periodically from the
+    revoked_jti:* keys so expired revocations fall out of the filter. A filter
+    hit is only a possible match and is confirmed against Redis.
+    """
+
+    def __init__(self):
+        self.bloom = self._new_filter()
+        self.ready = False
+        self._listening = False
+        self._rebuild_lock = asyncio.Lock()
+        # Filters being built; revocations that arrive mid-scan are added to them too
+        self._building: List[BloomFilter] = []
+        self._tasks = []
+
+    def _new_filter(self) -> BloomFilter:
+        return BloomFilter(settings.REVOCATION_FILTER_CAPACITY, settings.REVOCATION_FILTER_ERROR_RATE)
+
+    def add(self, jti: str):
+        self.bloom.add(jti)
+        for bloom in self._building:
+            bloom.add(jti)
+
+    def might_be_revoked(self, jti: str) -> bool:
+        # Until the first load completes every token has to be checked in Redis
+        return not self.ready or jti in self.bloom
+
+    async def rebuild(self):
+        """Rebuild the filter from the revocation keys still alive in Redis"""
+        async with self._rebuild_lock:
+            bloom = self._new_filter()
+            self._building.append(bloom)
+            try:
+                async for key in redis_async.scan_iter(match=f"{REVOKED_KEY_PREFIX}*", count=1000):
+                    bloom.add(key[len(REVOKED_KEY_PREFIX):])
+                self.bloom = bloom
+                # Without the listener, revocations from other processes would be missed
+                self.ready = self._listening
+            finally:
+                self._building.remove(bloom)
+
+    async def _listen(self):
+        while True:
+            # Dedicated connection without a socket timeout: an idle channel is normal
+            pubsub = redis_pubsub.pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                self._listening = True
+                # Load after subscribing so revocations published meanwhile are not lost
+                await self.rebuild()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.add(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._listening = False
+                self.ready = False
+                logger.error(f"Token revocation listener error, reconnecting: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                self._listening = False
+                await pubsub.aclose()
+
+    async def _rebuild_periodically(self):
+        while True:
+            await asyncio.sleep(settings.REVOCATION_FILTER_REBUILD_SECONDS)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Error rebuilding token revocation filter: {str(e)}")
+
+    async def start(self):
+        if not redis_pubsub or self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._rebuild_periodically()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+revocation_filter = RevocationFilter()
+
+async def revoke_token(jti: str, expires_at: int):
+    """Revoke a token until its own expiry"""
+    ttl = int(expires_at - time.time())
+    if ttl <= 0:
+        return
+    pipe = redis_async.pipeline(transaction=False)
+    pipe.set(f"{REVOKED_KEY_PREFIX}{jti}", "1", ex=ttl)
+    pipe.publish(REVOCATION_CHANNEL, jti)
+    await pipe.execute()
+    revocation_filter.add(jti)
+
+async def is_token_revoked(jti: str) -> bool:
+    """Check revocation, only going to Redis when the filter reports a possible match.
+
+    If Redis cannot be reached, a token the filter reports as possibly revoked
+    is treated as revoked. While the filter is not loaded it reports nothing,
+    so tokens are accepted on their signature and expiry alone rather than
+    failing every request.
+    """
+    if not revocation_filter.might_be_revoked(jti):
+        return False
+    try:
+        return bool(await redis_async.exists(f"{REVOKED_KEY_PREFIX}{jti}"))
+    except Exception as e:
+        logger.error(f"Error checking token revocation: {str(e)}")
+        return revocation_filter.ready
@@ -0,0 +1,93 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Any
+from app.database import redis_async
+from app.config import settings
+from app.models.user import User
+from app.utils.metrics import record_cache, cache_entries
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_KEY_PREFIX = "user:"
+
+class LocalTTLCache:
+    """Small per-process LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_user_cache = LocalTTLCache(settings.USER_CACHE_LOCAL_MAX_ENTRIES, settings.USER_CACHE_LOCAL_TTL_SECONDS)
+# Hit rates are exported as fyc_cache_requests_total{cache="user_local"|"user_redis"}
+cache_entries.labels("user_local").set_function(lambda: len(local_user_cache))
+
+async def get_cached_user(email: str) -> Optional[User]:
+    """Look a user up in the local cache, then in Redis"""
+    user = local_user_cache.get(email)
+    if user is not None:
+        record_cache("user_local", "hit")
+        return user
+    record_cache("user_local", "miss")
+    
+    try:
+        cached = await redis_async.get(f"{USER_CACHE_KEY_PREFIX}{email}")
+    except Exception as e:
+        logger.error(f"Error reading user cache: {str(e)}")
+        cached = None
+    if cached:
+        user = User.model_validate_json(cached)
+        local_user_cache.set(email, user)
+        record_cache("user_redis", "hit")
+        return user
+    
+    record_cache("user_redis", "miss")
+    return None
+
+async def cache_user(user: User):
+    """Store a resolved user in both cache tiers"""
+    local_user_cache.set(user.email, user)
+    try:
+        await redis_async.set(
+            f"{USER_CACHE_KEY_PREFIX}{user.email}",
+            user.model_dump_json(),
+            ex=settings.USER_CACHE_REDIS_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.error(f"Error writing user cache: {str(e)}")
+
+async def invalidate_cached_user(email: str):
+    """Drop a user from both cache tiers after it has been modified.
+
+    Other processes keep their local copy for at most USER_CACHE_LOCAL_TTL_SECONDS.
+    """
+    local_user_cache.pop(email)
+    try:
+        await redis_async.delete(f"{USER_CACHE_KEY_PREFIX}{email}")
+    except Exception as e:
+        logger.error(f"Error invalidating user cache: {str(e)}")
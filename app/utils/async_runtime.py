@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """Long-lived event loop running in a background thread.
+
+    Celery tasks submit coroutines from their own threads and block on the
+    result, while the loop multiplexes the I/O of every task in the process.
+    Clients bound to the loop (OpenAI, HTTP) are therefore reused across tasks.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[None]]):
+        """Register a coroutine function run on the loop before it stops"""
+        self._shutdown_hooks.append(hook)
+
+    def start(self):
+        with self._lock:
+            if self.loop is not None:
+                return
+            ready = threading.Event()
+
+            def run_loop():
+                self.loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self.loop)
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                ready.set()
+                self.loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name="async-runtime", daemon=True)
+            self._thread.start()
+            ready.wait()
+            logger.info(f"Async runtime started (max {self.max_concurrency} concurrent coroutines)")
+
+    async def _limited(self, coro):
+        async with self._semaphore:
+            return await coro
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the shared loop and wait for its result"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._limited(coro), self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            if self.loop is None:
+                return
+
+            async def shutdown():
+                for hook in self._shutdown_hooks:
+                    try:
+                        await hook()
+                    except Exception as e:
+                        logger.error(f"Error during async runtime shutdown: {str(e)}")
+
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=10)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=10)
+            self.loop.close()
+            self.loop = None
+            logger.info("Async runtime stopped")
@@ -1,50 +1,180 @@
+import json
+import time
+import codecs
+import logging
 import httpx
-import requests
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
+from app.database import redis_async
+from app.utils.http_client import get_http_client
+from app.utils.metrics import record_cache, scrape_seconds
 
-async def scrape_competitor_data(website: str) -> str:
-    if not website:
-        return "No website provided for scraping."
+logger = logging.getLogger(__name__)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(website, timeout=10.0)
-            response.raise_for_status()
-        except httpx.RequestError as e:
-            return f"An error occurred while requesting {website}: {str(e)}"
-        except httpx.HTTPStatusError as e:
-            return f"Error response {e.response.status_code} while requesting {website}"
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Extract relevant information from the website
-    title = soup.title.string if soup.title else "No title found"
-    description = soup.find('meta', attrs={'name': 'description'})
-    description = description['content'] if description else "No description found"
-    
-    # Extract main content (this is a simple example and might need adjustment)
-    main_content = soup.find('main')
-    if main_content:
-        text_content = main_content.get_text(strip=True)[:500]  # Limit to 500 characters
-    else:
-        text_content = soup.get_text(strip=True)[:500]
-        
-    scraped_data = f"""
+SCRAPE_MAX_BYTES = 256 * 1024  # stop reading pages after this much
+SCRAPE_TEXT_LIMIT = 500  # characters of main content we keep
+SCRAPE_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+class PageSummaryParser(HTMLParser):
+    """Incremental extractor for the title, meta description and main text.
+
+    Fed chunk by chunk while the body downloads, so the download can stop as
+    soon as enough <main> text has been collected.
+    """
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+    def __init__(self, text_limit: int = SCRAPE_TEXT_LIMIT):
+        super().__init__(convert_charrefs=True)
+        self.text_limit = text_limit
+        self.title = None
+        self.description = None
+        self.main_text = ""
+        self.page_text = ""
+        self._in_title = False
+        self._main_depth = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return len(self.main_text) >= self.text_limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "title" and self.title is None:
+            self._in_title = True
+            self.title = ""
+        elif tag == "main":
+            self._main_depth += 1
+        elif tag == "meta" and self.description is None:
+            attrs = dict(attrs)
+            if (attrs.get("name") or "").lower() == "description":
+                self.description = attrs.get("content") or ""
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "main" and self._main_depth:
+            self._main_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth:
+            return
+        text = data.strip()
+        if not text:
+            return
+        if len(self.page_text) < self.text_limit:
+            self.page_text += text
+        if self._main_depth and len(self.main_text) < self.text_limit:
+            self.main_text += text
+
+    def summary(self) -> str:
+        title = self.title.strip() if self.title else "No title found"
+        description = self.description if self.description is not None else "No description found"
+        text_content = (self.main_text or self.page_text)[:self.text_limit]
+        return f"""
     Title: {title}
     Description: {description}
     Main Content Preview: {text_content}...
     """
-    
-    return scraped_data
 
 
+async def read_limited(response: httpx.Response, max_bytes: int, parser: PageSummaryParser = None) -> bytes:
+    """Read at most max_bytes of a streamed body, stopping early once the parser is done"""
+    body = bytearray()
+    # Incremental decoding keeps multi-byte characters split across chunks intact
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="ignore")
+    async for chunk in response.aiter_bytes():
+        chunk = chunk[:max_bytes - len(body)]
+        body.extend(chunk)
+        if parser is not None:
+            parser.feed(decoder.decode(chunk))
+            if parser.done:
+                break
+        if len(body) >= max_bytes:
+            break
+    return bytes(body)
+
+
+async def get_cached_scrape(website: str):
+    try:
+        cached = await redis_async.get(f"scrape_cache:{website}")
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.error(f"Error reading scrape cache: {str(e)}")
+        return None
+
+async def cache_scrape(website: str, response: httpx.Response, scraped_data: str):
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    try:
+        await redis_async.set(
+            f"scrape_cache:{website}",
+            json.dumps({"etag": etag, "last_modified": last_modified, "data": scraped_data}),
+            ex=SCRAPE_CACHE_TTL
+        )
+    except Exception as e:
+        logger.error(f"Error writing scrape cache: {str(e)}")
+
+
+async def fetch_page_summary(website: str):
+    """Return (outcome, summary) where outcome is fetched, not_modified or error"""
+    # Revalidate with the stored validators instead of downloading the page again
+    cached = await get_cached_scrape(website)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    client = get_http_client()
+    parser = PageSummaryParser()
+    try:
+        async with client.stream("GET", website, headers=headers) as response:
+            if response.status_code == 304 and cached:
+                record_cache("scrape", "hit")
+                return "not_modified", cached["data"]
+            record_cache("scrape", "stale" if cached else "miss")
+            response.raise_for_status()
+            await read_limited(response, SCRAPE_MAX_BYTES, parser)
+    except httpx.RequestError as e:
+        return "error", f"An error occurred while requesting {website}: {str(e)}"
+    except httpx.HTTPStatusError as e:
+        return "error", f"Error response {e.response.status_code} while requesting {website}"
+
+    scraped_data = parser.summary()
+    await cache_scrape(website, response, scraped_data)
+    return "fetched", scraped_data
+
+
+async def scrape_competitor_data(website: str) -> str:
+    if not website:
+        return "No website provided for scraping."
+
+    started = time.perf_counter()
+    outcome, scraped_data = await fetch_page_summary(website)
+    scrape_seconds.labels(outcome).observe(time.perf_counter() - started)
+    return scraped_data
+
 
 async def scrape_logo(website: str) -> str:
     try:
-        response = requests.get(website, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        client = get_http_client()
+        async with client.stream("GET", website) as response:
+            response.raise_for_status()
+            body = await read_limited(response, SCRAPE_MAX_BYTES)
+        soup = BeautifulSoup(body.decode(response.encoding or "utf-8", errors="ignore"), 'html.parser')
         
         # Look for common logo locations
         potential_logos = soup.select('img[src*=logo], a.logo img, .logo img, #logo img')
@@ -59,4 +189,3 @@ async def scrape_logo(website: str) -> str:
     except Exception as e:
         print(f"Error scraping logo from {website}: {str(e)}")
         return ""
-
@@ -0,0 +1,35 @@
+import asyncio
+import weakref
+import httpx
+
+SCRAPER_USER_AGENT = "Mozilla/5.0 (compatible; FYCBot/1.0)"
+SCRAPER_MAX_CONNECTIONS = 50
+SCRAPER_CONNECT_TIMEOUT = 5.0  # seconds
+SCRAPER_READ_TIMEOUT = 10.0  # seconds
+
+# One pooled client per event loop, httpx connections are bound to their loop
+_loop_clients = weakref.WeakKeyDictionary()
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for outbound scraping requests"""
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=SCRAPER_MAX_CONNECTIONS,
+                max_keepalive_connections=SCRAPER_MAX_CONNECTIONS,
+                keepalive_expiry=30,
+            ),
+            timeout=httpx.Timeout(SCRAPER_READ_TIMEOUT, connect=SCRAPER_CONNECT_TIMEOUT),
+            follow_redirects=True,
+            headers={"User-Agent": SCRAPER_USER_AGENT},
+        )
+        _loop_clients[loop] = client
+    return client
+
+async def close_http_client():
+    """Close the running loop's client, if any"""
+    client = _loop_clients.pop(asyncio.get_running_loop(), None)
+    if client:
+        await client.aclose()
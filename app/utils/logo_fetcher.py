@@ -1,42 +1,182 @@
+import asyncio
+import weakref
 import aiohttp
-import requests
 from bson import ObjectId
 import logging
-from app.database import redis_client, get_collection
+from typing import Dict, Iterable, Optional
+from pymongo import UpdateOne
+from app.config import settings
+from app.database import redis_client, get_collection, get_sync_collection
 from app.models.competitor import Competitor
+from app.utils.metrics import record_cache
+from app.utils.url_utils import extract_hostname
 
 logger = logging.getLogger(__name__)
 
-def fetch_logo_url_sync(domain: str) -> str:
-    """Synchronous version of logo fetching."""
+CLEARBIT_LOGO_URL = settings.LOGO_PROVIDER_URL
+GOOGLE_FAVICON_URL = settings.FAVICON_PROVIDER_URL
+PLACEHOLDER_LOGO_URL = "/placeholder-logo.png"
+
+LOGO_MAX_CONCURRENCY = 8
+LOGO_MAX_CONNECTIONS_PER_HOST = 4
+LOGO_CONNECT_TIMEOUT = 3  # seconds
+LOGO_READ_TIMEOUT = 5  # seconds
+LOGO_MISS_TTL = 6 * 60 * 60  # domains Clearbit has no logo for
+
+
+def logo_domain(website: str) -> str:
+    """Domain to look a logo up for, e.g. https://www.acme.com/about -> acme.com"""
+    hostname = extract_hostname(website)
+    return hostname[4:] if hostname.startswith("www.") else hostname
+
+
+class LogoResolver:
+    """Resolves logos for a batch of websites concurrently.
+
+    One pooled session per event loop is shared by every batch, Clearbit is
+    probed with HEAD before falling back to GET, and domains without a Clearbit
+    logo are remembered in a Redis negative cache so they go straight to the
+    favicon.
+    """
+
+    def __init__(self, max_concurrency: int = LOGO_MAX_CONCURRENCY,
+                 connect_timeout: float = LOGO_CONNECT_TIMEOUT,
+                 read_timeout: float = LOGO_READ_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout
+        )
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=LOGO_MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """Close the running loop's session, if any"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session:
+            await session.close()
+
+    def _known_misses(self, domains: list) -> set:
+        if not redis_client or not domains:
+            return set()
+        try:
+            cached = redis_client.mget([f"logo_miss:{domain}" for domain in domains])
+            misses = {domain for domain, miss in zip(domains, cached) if miss}
+            record_cache("logo_negative", "hit", len(misses))
+            record_cache("logo_negative", "miss", len(domains) - len(misses))
+            return misses
+        except Exception as e:
+            logger.error(f"Error reading logo negative cache: {str(e)}")
+            return set()
+
+    def _remember_misses(self, domains: list):
+        if not redis_client or not domains:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for domain in domains:
+                pipe.set(f"logo_miss:{domain}", "1", ex=LOGO_MISS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing logo negative cache: {str(e)}")
+
+    async def _probe(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                     domain: str) -> Optional[bool]:
+        """True if Clearbit has a logo, False if it has none, None if unknown"""
+        clearbit_url = CLEARBIT_LOGO_URL.format(domain=domain)
+        async with semaphore:
+            try:
+                async with session.head(clearbit_url, allow_redirects=True) as response:
+                    status = response.status
+                if status in (405, 501):
+                    async with session.get(clearbit_url) as response:
+                        status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Logo probe failed for domain {domain}: {str(e)}")
+                return None
+        if status == 200:
+            return True
+        if status == 404:
+            return False
+        return None
+
+    async def resolve_many(self, websites: Iterable[str]) -> Dict[str, str]:
+        """Map each website to a logo URL"""
+        domains = {website: logo_domain(website) for website in websites if website}
+        unique_domains = sorted({domain for domain in domains.values() if domain})
+        # Blocking Redis calls run in a thread, off the shared event loop
+        misses = await asyncio.to_thread(self._known_misses, unique_domains)
+        to_probe = [domain for domain in unique_domains if domain not in misses]
+
+        found = {}
+        if to_probe:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            session = self._get_session()
+            results = await asyncio.gather(
+                *(self._probe(session, semaphore, domain) for domain in to_probe)
+            )
+            found = dict(zip(to_probe, results))
+            await asyncio.to_thread(
+                self._remember_misses, [domain for domain, has_logo in found.items() if has_logo is False]
+            )
+
+        logos = {}
+        for website, domain in domains.items():
+            if not domain:
+                logos[website] = PLACEHOLDER_LOGO_URL
+            elif found.get(domain):
+                logos[website] = CLEARBIT_LOGO_URL.format(domain=domain)
+            else:
+                # Fallback to Google Favicon
+                logos[website] = GOOGLE_FAVICON_URL.format(domain=domain)
+        return logos
+
+
+logo_resolver = LogoResolver()
+
+async def resolve_logos(websites: Iterable[str]) -> Dict[str, str]:
+    """Resolve logos for many websites concurrently."""
     try:
-        # Try Clearbit first
-        clearbit_url = f"https://logo.clearbit.com/{domain}"
-        response = requests.get(clearbit_url)
-        if response.status_code == 200:
-            return clearbit_url
-                
-        # Fallback to Google Favicon
-        return f"https://www.google.com/s2/favicons?domain={domain}"
+        return await logo_resolver.resolve_many(websites)
     except Exception as e:
-        logger.error(f"Error fetching logo for domain {domain}: {str(e)}")
-        return "/placeholder-logo.png"
+        logger.error(f"Error resolving logos: {str(e)}")
+        return {website: PLACEHOLDER_LOGO_URL for website in websites}
+
+async def close_logo_session():
+    await logo_resolver.close()
+
+def resolve_logos_sync(websites: Iterable[str]) -> Dict[str, str]:
+    """Synchronous version of resolve_logos, for code running outside an event loop."""
+    websites = list(websites)
+
+    async def resolve_and_close():
+        try:
+            return await resolve_logos(websites)
+        finally:
+            await close_logo_session()
+
+    return asyncio.run(resolve_and_close())
+
+def fetch_logo_url_sync(domain: str) -> str:
+    """Synchronous version of logo fetching."""
+    return resolve_logos_sync([domain]).get(domain, PLACEHOLDER_LOGO_URL)
 
 async def fetch_logo_url(domain: str) -> str:
     """Fetch logo URL for a single domain."""
-    try:
-        # Try Clearbit first
-        clearbit_url = f"https://logo.clearbit.com/{domain}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(clearbit_url) as response:
-                if response.status == 200:
-                    return clearbit_url
-                
-        # Fallback to Google Favicon
-        return f"https://www.google.com/s2/favicons?domain={domain}"
-    except Exception as e:
-        logger.error(f"Error fetching logo for domain {domain}: {str(e)}")
-        return "/placeholder-logo.png"
+    return (await resolve_logos([domain])).get(domain, PLACEHOLDER_LOGO_URL)
 
 async def update_competitor_logo_in_db(competitor_id: str, logo_url: str):
     """Helper function to update logo in database"""
@@ -48,3 +188,17 @@ async def update_competitor_logo_in_db(competitor_id: str, logo_url: str):
         )
     except Exception as e:
         logger.error(f"Error updating logo in database: {str(e)}")
+
+def update_competitor_logos_in_db_sync(logos: Dict[str, str]):
+    """Bulk form of update_competitor_logo_in_db, mapping competitor _id to logo URL"""
+    if not logos:
+        return
+    try:
+        competitors_collection = get_sync_collection("competitors")
+        competitors_collection.bulk_write(
+            [UpdateOne({"_id": competitor_id}, {"$set": {"logo": logo_url}})
+             for competitor_id, logo_url in logos.items()],
+            ordered=False
+        )
+    except Exception as e:
+        logger.error(f"Error updating logos in database: {str(e)}")
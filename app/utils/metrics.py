@@ -0,0 +1,122 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    push_to_gateway,
+)
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Searches span milliseconds (cache hits) to minutes (LLM calls)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+search_stage_seconds = Histogram(
+    "fyc_search_stage_seconds",
+    "Time spent in each stage of a competitor search task",
+    ["task_type", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+current_user_seconds = Histogram(
+    "fyc_get_current_user_seconds",
+    "Time to resolve the authenticated user of a request",
+)
+scrape_seconds = Histogram(
+    "fyc_scrape_seconds",
+    "Time to scrape a competitor website, by outcome",
+    ["result"],
+    buckets=LATENCY_BUCKETS,
+)
+cache_requests = Counter(
+    "fyc_cache_requests_total",
+    "Cache lookups by cache and result (hit, miss, stale)",
+    ["cache", "result"],
+)
+cache_entries = Gauge(
+    "fyc_cache_entries",
+    "Entries currently held by a cache",
+    ["cache"],
+)
+llm_request_seconds = Histogram(
+    "fyc_llm_request_seconds",
+    "Duration of LLM calls by task type",
+    ["task_type"],
+    buckets=LATENCY_BUCKETS,
+)
+llm_tokens = Counter(
+    "fyc_llm_tokens_total",
+    "LLM tokens used by task type and kind (prompt, completion)",
+    ["task_type", "kind"],
+)
+llm_cost = Counter(
+    "fyc_llm_cost_usd_total",
+    "Estimated LLM cost in USD by task type",
+    ["task_type"],
+)
+
+
+@contextmanager
+def time_stage(task_type: str, stage: str):
+    """Observe the duration of a search task stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        search_stage_seconds.labels(task_type, stage).observe(time.perf_counter() - started)
+
+def record_cache(cache: str, result: str, count: int = 1):
+    if count:
+        cache_requests.labels(cache, result).inc(count)
+
+def record_llm_usage(task_type: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    """Count the tokens of an LLM call and their estimated cost"""
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+    llm_tokens.labels(task_type, "prompt").inc(prompt_tokens)
+    llm_tokens.labels(task_type, "completion").inc(completion_tokens)
+    llm_cost.labels(task_type).inc(
+        prompt_tokens / 1000 * settings.LLM_PROMPT_COST_PER_1K_TOKENS
+        + completion_tokens / 1000 * settings.LLM_COMPLETION_COST_PER_1K_TOKENS
+    )
+
+def render_metrics():
+    """Return (body, content type) of the metrics in Prometheus text format"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+_push_lock = threading.Lock()
+_last_push = 0.0
+
+def push_metrics(force: bool = False):
+    """Push this worker's metrics to the Pushgateway, at most once per push interval"""
+    global _last_push
+    if not settings.PUSHGATEWAY_URL:
+        return
+    # Task threads that find a push in progress skip it rather than wait
+    if not _push_lock.acquire(blocking=force):
+        return
+    try:
+        now = time.monotonic()
+        if not force and now - _last_push < settings.METRICS_PUSH_INTERVAL_SECONDS:
+            return
+        push_to_gateway(
+            settings.PUSHGATEWAY_URL,
+            job="celery_worker",
+            grouping_key={"instance": f"{socket.gethostname()}-{os.getpid()}"},
+            registry=REGISTRY,
+        )
+        _last_push = now
+    except Exception as e:
+        logger.error(f"Failed to push metrics: {str(e)}")
+    finally:
+        _push_lock.release()
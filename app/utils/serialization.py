@@ -0,0 +1,58 @@
+import logging
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # fast serialization is opt-in
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+ORJSON_AVAILABLE = orjson is not None
+FAST_SERIALIZATION = settings.FAST_SERIALIZATION and ORJSON_AVAILABLE
+if settings.FAST_SERIALIZATION and orjson is None:
+    logger.warning("FAST_SERIALIZATION is enabled but orjson is not installed, using json")
+
+def _default(obj: Any):
+    # Mongo documents may carry ObjectIds; datetimes and UUIDs are native to orjson
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def loads(data):
+    return orjson.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, understanding ObjectIds"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def direct_response(content: Any):
+    """Serialize a plain payload (e.g. raw Mongo documents) straight to the response.
+
+    Returning a Response instance skips FastAPI's response_model validation and
+    jsonable_encoder pass, which is safe for payloads we built ourselves.
+    """
+    if FAST_SERIALIZATION:
+        return FastJSONResponse(content)
+    return content
+
+def register_celery_serializer():
+    """Register orjson as a kombu serializer named 'orjson'"""
+    from kombu.serialization import register
+    register(
+        "orjson",
+        dumps,
+        loads,
+        content_type="application/x-orjson",
+        content_encoding="utf-8",
+    )
@@ -0,0 +1,37 @@
+from urllib.parse import urlparse
+
+# Second-level public suffixes we commonly see in AI results. Not a full
+# public suffix list, just enough to keep "acme.co.uk" from collapsing to "co.uk".
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk",
+    "com.au", "net.au", "org.au",
+    "com.br", "com.ng", "com.mx", "com.ar", "com.tr", "com.sg", "com.hk",
+    "co.za", "co.jp", "co.in", "co.nz", "co.kr", "co.ke",
+}
+
+def looks_like_url(value: str) -> bool:
+    """Check whether a free-text value is a URL or bare domain"""
+    value = value.strip().lower()
+    if value.startswith(("http://", "https://", "www.")):
+        return True
+    return " " not in value and "." in value.strip(".")
+
+def extract_hostname(website: str) -> str:
+    """Return the lowercased hostname of a URL or bare domain"""
+    if not website:
+        return ""
+    website = website.strip()
+    if "://" not in website:
+        website = f"http://{website}"
+    hostname = urlparse(website).hostname or ""
+    return hostname.lower().strip(".")
+
+def registrable_domain(website: str) -> str:
+    """Reduce a URL to its registrable domain, e.g. https://shop.acme.co.uk/x -> acme.co.uk"""
+    hostname = extract_hostname(website)
+    labels = [label for label in hostname.split(".") if label]
+    if len(labels) <= 2:
+        return ".".join(labels)
+    if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
@@ -0,0 +1,59 @@
+"""Helpers shared by the benchmark scripts."""
+import asyncio
+import time
+from uuid import uuid4
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Count and p50/p95/p99 (in milliseconds) of latency samples in seconds"""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def sample_competitor(index):
+    return {
+        "_id": str(uuid4()),
+        "name": f"Competitor {index}",
+        "business_type": "Artisan bakery and coffee shop",
+        "location": "Lagos, Nigeria",
+        "logo": "https://logo.clearbit.com/example.com",
+        "revenue_range": "$1M-$10M",
+        "what_they_sell": ["Bread", "Pastries", "Coffee", "Catering"],
+        "target_market": "Urban professionals and families in Lagos",
+        "description": "A neighbourhood bakery chain known for sourdough and specialty coffee. " * 2,
+        "website": f"https://competitor{index}.example.com",
+        "strengths": ["Brand recognition", "Prime locations", "Loyal customer base"],
+        "social_media": {
+            "facebook": f"https://facebook.com/competitor{index}",
+            "twitter": f"https://twitter.com/competitor{index}",
+            "youtube": None,
+            "instagram": f"https://instagram.com/competitor{index}",
+        },
+        "user_id": None,
+        "search_id": "",
+    }
+
+
+async def wait_for_task(client, task_id, poll_interval=0.25, timeout=300):
+    """Poll a search task until it completes or fails, returning its final status payload"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get(f"/competitors/search/status/{task_id}")
+        if response.status_code == 200:
+            data = response.json()
+            if data["status"] in ("completed", "failed"):
+                return data
+        await asyncio.sleep(poll_interval)
+    raise TimeoutError(f"Task {task_id} did not finish within {timeout}s")
@@ -0,0 +1,385 @@
+"""End-to-end benchmark against local stand-ins.
+
+Starts the stand-in server (benchmarks.stand_ins: fake OpenAI, logo and
+scrape hosts), the API under uvicorn and one Celery worker per queue, all
+wired to a local MongoDB and Redis. Then it drives the find -> poll ->
+paginate, login and insights flows at a fixed concurrency, prints throughput
+and p50/p95/p99 per step, and saves the report to benchmarks/results/ so runs
+can be compared.
+
+Each run uses a throwaway Mongo database (dropped afterwards unless
+--keep-data) and FLUSHES the Redis database in --redis-url, so point it at a
+dedicated database number.
+
+    python -m benchmarks.harness --concurrency 20 --duration 60
+    python -m benchmarks.harness --env FAST_SERIALIZATION=true --label orjson \
+        --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from uuid import uuid4
+import httpx
+import pymongo
+import redis
+from benchmarks.common import sample_competitor, summarize, wait_for_task
+
+RESULTS_DIR = Path(__file__).parent / "results"
+FLOWS = ("find", "login", "insights")
+WORKER_QUEUES = ("find", "lookup", "logos", "insights")
+STARTUP_TIMEOUT = 60  # seconds
+
+
+class Recorder:
+    """Latency samples and error counts per step"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def timed(self, step, coro):
+        started = time.perf_counter()
+        try:
+            result = await coro
+        except Exception:
+            self.errors[step] += 1
+            raise
+        self.samples[step].append(time.perf_counter() - started)
+        return result
+
+    def report(self, duration):
+        steps = {}
+        for step in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples.get(step, [])
+            steps[step] = dict(
+                summarize(samples),
+                throughput_per_s=len(samples) / duration,
+                errors=self.errors.get(step, 0),
+            )
+        return steps
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def service_env(args, database_name, stub_url):
+    env = dict(
+        os.environ,
+        MONGODB_URL=args.mongodb_url,
+        DATABASE_NAME=database_name,
+        REDIS_URL=args.redis_url,
+        OPENAI_API_KEY="benchmark",
+        OPENAI_BASE_URL=f"{stub_url}/v1",
+        LOGO_PROVIDER_URL=f"{stub_url}/logo/{{domain}}",
+        FAVICON_PROVIDER_URL=f"{stub_url}/favicon?domain={{domain}}",
+        JWT_SECRET_KEY="benchmark-secret",
+        MAIL_USERNAME="benchmark",
+        MAIL_PASSWORD="benchmark",
+        MAIL_FROM="benchmark@example.com",
+        MAIL_SERVER="localhost",
+    )
+    env.update(args.env)
+    return env
+
+
+def start_services(args, database_name, log_dir):
+    """Start the stand-ins, the API and the workers; returns (processes, api_url)"""
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    env = service_env(args, database_name, stub_url)
+    commands = {
+        "stand_ins": [
+            sys.executable, "-m", "benchmarks.stand_ins", "--port", str(args.stub_port),
+            "--llm-latency", str(args.llm_latency),
+            "--logo-latency", str(args.logo_latency),
+            "--scrape-latency", str(args.scrape_latency),
+        ],
+        "api": [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+            "--port", str(args.api_port), "--workers", str(args.api_workers), "--log-level", "warning",
+        ],
+    }
+    envs = {}
+    # One worker per queue, as in the Procfile
+    for queue in WORKER_QUEUES:
+        commands[f"{queue}_worker"] = [
+            sys.executable, "-m", "celery", "-A", "app.celery_app", "worker", "--loglevel=warning",
+            "--pool=threads", "-Q", queue, "-n", f"{queue}@%h",
+        ]
+        envs[f"{queue}_worker"] = dict(env, WORKER_QUEUES=queue)
+    processes = {}
+    for name, command in commands.items():
+        log = open(log_dir / f"{name}.log", "w")
+        processes[name] = subprocess.Popen(command, env=envs.get(name, env), stdout=log, stderr=subprocess.STDOUT)
+    return processes, f"http://127.0.0.1:{args.api_port}"
+
+
+def stop_services(processes):
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_for_api(client, processes):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        for name, process in processes.items():
+            if process.poll() is not None:
+                raise RuntimeError(f"{name} exited with code {process.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"API did not start within {STARTUP_TIMEOUT}s")
+
+
+class Flows:
+    def __init__(self, client, args, recorder, database):
+        self.client = client
+        self.args = args
+        self.recorder = recorder
+        self.database = database
+        self.search_counter = count()
+
+    def search_description(self):
+        index = next(self.search_counter)
+        if self.args.distinct_searches:
+            index %= self.args.distinct_searches
+        else:
+            index = f"{index}-{uuid4().hex[:8]}"
+        return f"Artisan bakery and coffee shop {index}"
+
+    async def account(self, suffix):
+        """Register (if needed) and log in a benchmark user; returns (credentials, token)"""
+        credentials = {"username": f"bench-{suffix}@example.com", "password": "benchmark-password"}
+        await self.client.post("/auth/register", json={
+            "email": credentials["username"], "name": "Benchmark", "password": credentials["password"]
+        })
+        response = await self.client.post("/auth/token", data=credentials)
+        response.raise_for_status()
+        return credentials, response.json()
+
+    async def find_once(self):
+        """Submit a search, wait for it and page through its results; True if it all succeeded"""
+        timed = self.recorder.timed
+        started = time.perf_counter()
+        body = {"business_description": self.search_description(), "location": "Lagos, Nigeria"}
+        try:
+            response = await timed("find.submit", self.client.post("/competitors/find", json=body))
+            response.raise_for_status()
+            status = await timed("find.complete", wait_for_task(
+                self.client, response.json()["task_id"], poll_interval=self.args.poll_interval
+            ))
+            if status["status"] != "completed":
+                self.recorder.errors["find.complete"] += 1
+                return False
+            params = {"search_id": status["search_id"], "limit": self.args.page_size}
+            while True:
+                page = await timed("find.page", self.client.post("/competitors/find", json=body, params=params))
+                page.raise_for_status()
+                cursor = page.json().get("next_cursor")
+                if not cursor:
+                    break
+                params["after"] = cursor
+        except Exception:
+            return False
+        self.recorder.samples["find.flow"].append(time.perf_counter() - started)
+        return True
+
+    async def find(self, worker_id, deadline):
+        while time.monotonic() < deadline:
+            await self.find_once()
+
+    async def login(self, worker_id, deadline):
+        credentials, _ = await self.account(f"login-{worker_id}")
+        while time.monotonic() < deadline:
+            try:
+                response = await self.recorder.timed("login", self.client.post("/auth/token", data=credentials))
+                response.raise_for_status()
+            except Exception:
+                continue
+
+    async def insights(self, worker_id, deadline):
+        _, token = await self.account(f"insights-{worker_id}")
+        # Saved competitors aren't returned with their ids by the API, so seed them directly
+        stub_url = f"http://127.0.0.1:{self.args.stub_port}"
+        docs = []
+        for i in range(self.args.insights_competitors):
+            doc = sample_competitor(f"{worker_id}-{i}")
+            doc.pop("_id")
+            doc.update(user_id=token["id"], website=f"{stub_url}/sites/{worker_id}-{i}")
+            docs.append(doc)
+        result = await asyncio.to_thread(self.database.competitors.insert_many, docs)
+        competitor_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        requests = count()
+        while time.monotonic() < deadline:
+            competitor_id = competitor_ids[next(requests) % len(competitor_ids)]
+            try:
+                response = await self.recorder.timed("insights", self.client.get(
+                    f"/competitors/{competitor_id}/insights", headers=headers
+                ))
+                response.raise_for_status()
+            except Exception:
+                continue
+
+
+async def drive(args, api_url, database):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency * len(args.flows) + 10)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=120) as client:
+        # One search end to end checks that the worker and stand-ins are wired up
+        if not await Flows(client, args, Recorder(), database).find_once():
+            raise RuntimeError(f"Warm-up search failed, see the logs in {RESULTS_DIR / 'logs'}")
+
+        flows = Flows(client, args, recorder, database)
+        deadline = time.monotonic() + args.duration
+        started = time.monotonic()
+        await asyncio.gather(*(
+            getattr(flows, flow)(worker_id, deadline)
+            for flow in args.flows for worker_id in range(args.concurrency)
+        ))
+        return recorder.report(time.monotonic() - started)
+
+
+def compare(report, baseline, tolerance):
+    """Print p95 and throughput changes against a baseline; returns the regressed steps"""
+    regressions = []
+    print(f"\ncompared with {baseline.get('label')} ({baseline.get('revision')}):")
+    for step, current in report["steps"].items():
+        previous = baseline.get("steps", {}).get(step)
+        if not previous or not previous["count"] or not current["count"]:
+            continue
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        throughput_change = current["throughput_per_s"] / previous["throughput_per_s"] - 1
+        regressed = p95_change > tolerance or throughput_change < -tolerance
+        if regressed:
+            regressions.append(step)
+        print(f"  {step:16} p95 {p95_change:+7.1%}  throughput {throughput_change:+7.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'step':16} {'count':>7} {'per s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for step, stats in report["steps"].items():
+        print(f"{step:16} {stats['count']:7} {stats['throughput_per_s']:8.2f} {stats['p50_ms']:9.1f} "
+              f"{stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f} {stats['errors']:7}")
+
+
+def parse_env(value):
+    key, _, val = value.partition("=")
+    if not key or not _:
+        raise argparse.ArgumentTypeError("expected KEY=VALUE")
+    return key, val
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--label", default="run", help="name of this run in the saved report")
+    parser.add_argument("--flows", default=",".join(FLOWS), help=f"comma-separated subset of {','.join(FLOWS)}")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients per flow")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to drive load")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/14")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="fake OpenAI seconds per completion")
+    parser.add_argument("--logo-latency", type=float, default=0.05)
+    parser.add_argument("--scrape-latency", type=float, default=0.1)
+    parser.add_argument("--page-size", type=int, default=4, help="limit used when paginating results")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--distinct-searches", type=int, default=0,
+                        help="cycle through this many search inputs (0: every search is new)")
+    parser.add_argument("--insights-competitors", type=int, default=5, help="saved competitors per insights client")
+    parser.add_argument("--env", type=parse_env, action="append", default=[],
+                        help="KEY=VALUE setting for the API and worker, repeatable")
+    parser.add_argument("--output", type=Path, help="report path (default benchmarks/results/<label>-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="p95 increase or throughput drop counted as a regression")
+    parser.add_argument("--keep-data", action="store_true", help="keep the Mongo database after the run")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.flows = [flow for flow in args.flows.split(",") if flow]
+    unknown = set(args.flows) - set(FLOWS)
+    if unknown:
+        sys.exit(f"Unknown flows: {', '.join(sorted(unknown))}")
+
+    log_dir = RESULTS_DIR / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    database_name = f"fyc_benchmark_{uuid4().hex[:8]}"
+    redis.from_url(args.redis_url).flushdb()
+    mongo = pymongo.MongoClient(args.mongodb_url)
+
+    processes, api_url = start_services(args, database_name, log_dir)
+    try:
+        async def run():
+            async with httpx.AsyncClient(base_url=api_url) as client:
+                await wait_for_api(client, processes)
+            return await drive(args, api_url, mongo[database_name])
+
+        steps = asyncio.run(run())
+    finally:
+        stop_services(processes)
+        if not args.keep_data:
+            mongo.drop_database(database_name)
+        mongo.close()
+
+    report = {
+        "label": args.label,
+        "revision": git_revision(),
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            "flows": args.flows,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "llm_latency": args.llm_latency,
+            "logo_latency": args.logo_latency,
+            "scrape_latency": args.scrape_latency,
+            "page_size": args.page_size,
+            "distinct_searches": args.distinct_searches,
+            "api_workers": args.api_workers,
+            "env": dict(args.env),
+        },
+        "steps": steps,
+    }
+    print_report(report)
+
+    output = args.output or RESULTS_DIR / f"{args.label}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nreport saved to {output}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+        if regressions:
+            sys.exit(f"regressions in: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
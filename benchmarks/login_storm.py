@@ -0,0 +1,74 @@
+"""Login storm benchmark.
+
+Fires concurrent logins at a running API while probing an unrelated endpoint,
+and reports login throughput plus the probe's latency percentiles.
+
+    python -m benchmarks.login_storm --base-url http://localhost:8000 \
+        --email bench@example.com --password secret --concurrency 50 --duration 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from benchmarks.common import percentile
+
+
+async def login_worker(client, args, deadline, results):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        response = await client.post(
+            "/auth/token",
+            data={"username": args.email, "password": args.password},
+        )
+        results["login_latencies"].append(time.perf_counter() - started)
+        results["login_status"][response.status_code] = results["login_status"].get(response.status_code, 0) + 1
+
+
+async def probe_worker(client, args, deadline, results):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await client.get(args.probe_path)
+        results["probe_latencies"].append(time.perf_counter() - started)
+        await asyncio.sleep(args.probe_interval)
+
+
+async def run(args):
+    results = {"login_latencies": [], "probe_latencies": [], "login_status": {}}
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        # Make sure the account exists
+        await client.post("/auth/register", json={
+            "email": args.email, "name": "Benchmark", "password": args.password
+        })
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(
+            probe_worker(client, args, deadline, results),
+            *(login_worker(client, args, deadline, results) for _ in range(args.concurrency)),
+        )
+
+    logins = results["login_latencies"]
+    probes = results["probe_latencies"]
+    print(f"logins: {len(logins)} in {args.duration}s ({len(logins) / args.duration:.1f}/s), status codes {results['login_status']}")
+    if logins:
+        print(f"login latency  p50={percentile(logins, 50) * 1000:.0f}ms p99={percentile(logins, 99) * 1000:.0f}ms")
+    if probes:
+        print(f"probe {args.probe_path} latency  p50={percentile(probes, 50) * 1000:.1f}ms "
+              f"p99={percentile(probes, 99) * 1000:.1f}ms max={max(probes) * 1000:.1f}ms "
+              f"mean={statistics.mean(probes) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="login-storm@example.com")
+    parser.add_argument("--password", default="login-storm-password")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--probe-path", default="/")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Lookup latency under a find backlog.
+
+Measures end-to-end /competitors/lookup latency (submit -> completed) first on
+an idle system, then while a backlog of /competitors/find searches is queued.
+With dedicated queues the lookup p95 should stay close to the idle baseline.
+Run it against an API and workers wired to a fake OpenAI server (see
+benchmarks/harness.py) so it costs nothing.
+
+    python -m benchmarks.lookup_under_find_backlog --backlog 200 --lookups 30
+"""
+import argparse
+import asyncio
+import json
+import time
+from uuid import uuid4
+import httpx
+from benchmarks.common import summarize, wait_for_task
+
+
+async def timed_lookup(client):
+    # Unique inputs so the result cache and singleflight don't short-circuit
+    started = time.perf_counter()
+    response = await client.post("/competitors/lookup", params={"name_or_url": f"Bench Co {uuid4().hex}"})
+    response.raise_for_status()
+    await wait_for_task(client, response.json()["task_id"])
+    return time.perf_counter() - started
+
+
+async def run_lookups(client, count, interval):
+    latencies = []
+
+    async def one(delay):
+        await asyncio.sleep(delay)
+        latencies.append(await timed_lookup(client))
+
+    await asyncio.gather(*(one(i * interval) for i in range(count)))
+    return latencies
+
+
+async def submit_backlog(client, count):
+    task_ids = []
+    for _ in range(count):
+        response = await client.post("/competitors/find", json={
+            "business_description": f"Benchmark bakery {uuid4().hex}",
+            "location": "Lagos",
+        })
+        response.raise_for_status()
+        task_ids.append(response.json()["task_id"])
+    return task_ids
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        baseline = await run_lookups(client, args.lookups, args.interval)
+        await submit_backlog(client, args.backlog)
+        under_backlog = await run_lookups(client, args.lookups, args.interval)
+
+    report = {
+        "backlog": args.backlog,
+        "lookup_idle": summarize(baseline),
+        "lookup_under_find_backlog": summarize(under_backlog),
+    }
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--backlog", type=int, default=200, help="find searches queued before measuring")
+    parser.add_argument("--lookups", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between lookup submissions")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
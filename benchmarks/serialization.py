@@ -0,0 +1,74 @@
+"""Encode/decode cost of a 12-competitor search result per serializer.
+
+Compares the stdlib json path (FastAPI's jsonable_encoder + JSONResponse, and
+kombu's json serializer) against orjson and, when installed, msgpack. Times are
+per result in microseconds, best of --repeat runs.
+
+    python -m benchmarks.serialization --iterations 2000
+"""
+import argparse
+import json
+import timeit
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from benchmarks.common import sample_competitor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def sample_result():
+    competitors = [dict(sample_competitor(i), _id=ObjectId()) for i in range(12)]
+    return {"competitors": competitors, "search_id": "bench", "total": 12, "next_cursor": None}
+
+
+def orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+def cases(result):
+    """(name, encode, decode) for each available serializer"""
+    yield (
+        "fastapi jsonable_encoder + json",
+        lambda: JSONResponse(jsonable_encoder(result, custom_encoder={ObjectId: str})).body,
+        json.loads,
+    )
+    yield ("json (kombu default)", lambda: json.dumps(result, default=str), json.loads)
+    if orjson is not None:
+        yield ("orjson", lambda: orjson.dumps(result, default=orjson_default), orjson.loads)
+    if msgpack is not None:
+        yield (
+            "msgpack",
+            lambda: msgpack.packb(result, default=str, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = sample_result()
+    print(f"{'serializer':34} {'encode us':>10} {'decode us':>10} {'bytes':>7}")
+    for name, encode, decode in cases(result):
+        payload = encode()
+        encode_time = min(timeit.repeat(encode, number=args.iterations, repeat=args.repeat))
+        decode_time = min(timeit.repeat(lambda: decode(payload), number=args.iterations, repeat=args.repeat))
+        print(f"{name:34} {encode_time / args.iterations * 1e6:10.1f} "
+              f"{decode_time / args.iterations * 1e6:10.1f} {len(payload):7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Local stand-ins for the external services the app calls.
+
+One aiohttp server provides:
+
+    /v1/chat/completions   fake OpenAI: canned JSON for each response model,
+                           streamed or not, after a configurable latency
+    /logo/{domain}         logo provider (Clearbit) stand-in
+    /favicon               favicon provider stand-in
+    /sites/{n}             competitor websites for the scraper, with ETags
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1,
+LOGO_PROVIDER_URL=http://127.0.0.1:9100/logo/{domain} and
+FAVICON_PROVIDER_URL=http://127.0.0.1:9100/favicon?domain={domain}.
+benchmarks/harness.py starts it for you.
+
+    python -m benchmarks.stand_ins --port 9100 --llm-latency 2.0
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from uuid import uuid4
+from aiohttp import web
+
+COMPETITORS_PER_SEARCH = 12
+STREAM_CHUNK_SIZE = 64  # characters of content per streamed chunk
+
+# 1x1 transparent PNG
+LOGO_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6300010000000500010d0a2db40000"
+    "000049454e44ae426082"
+)
+
+SITE_TEMPLATE = """<!doctype html>
+<html><head>
+<title>Competitor {index} | Artisan bakery</title>
+<meta name="description" content="Competitor {index} bakes sourdough and roasts specialty coffee.">
+</head><body>
+<h1>Competitor {index}</h1>
+{paragraphs}
+</body></html>
+"""
+
+
+def competitor(index, base_url, with_countries=False):
+    doc = {
+        "name": f"Competitor {index}",
+        "business_type": "Artisan bakery and coffee shop",
+        "location": "Lagos, Nigeria",
+        "logo": "",
+        "revenue_range": "$1M-$10M",
+        "what_they_sell": ["Bread", "Pastries", "Coffee", "Catering"],
+        "target_market": "Urban professionals and families in Lagos",
+        "description": "A neighbourhood bakery chain known for sourdough and specialty coffee.",
+        "website": f"{base_url}/sites/{index}",
+        "strengths": ["Brand recognition", "Prime locations", "Loyal customer base"],
+        "social_media": {
+            "facebook": f"https://facebook.com/competitor{index}",
+            "twitter": None,
+            "youtube": None,
+            "instagram": f"https://instagram.com/competitor{index}",
+        },
+    }
+    if with_countries:
+        doc["countries"] = ["Nigeria", "Ghana", "Kenya"]
+    return doc
+
+
+def canned_content(messages, base_url):
+    """JSON (or plain text) answer for the response model instructor asked for.
+
+    instructor's JSON mode embeds the model's schema in the system message, so
+    the schema title tells us what to return.
+    """
+    text = "\n".join(str(message.get("content", "")) for message in messages)
+    # Offset the websites per search so scrape and logo caches see new hosts
+    offset = random.randrange(1000) * COMPETITORS_PER_SEARCH
+    competitors = lambda with_countries=False: [
+        competitor(offset + i, base_url, with_countries) for i in range(COMPETITORS_PER_SEARCH)
+    ]
+    if "IterableSingleCompetitorSearch" in text:
+        return json.dumps({"tasks": competitors(with_countries=True)})
+    if "IterableCompetitorBase" in text:
+        return json.dumps({"tasks": competitors()})
+    if "BatchCompetitorInsights" in text:
+        ids = re.findall(r"Competitor ID: (\S+)", text)
+        return json.dumps({"items": [
+            {"competitor_id": competitor_id, "insights": insight_lines(competitor_id)} for competitor_id in ids
+        ]})
+    if "SingleCompetitorSearchResult" in text:
+        return json.dumps({
+            "total": COMPETITORS_PER_SEARCH, "offset": 0, "limit": COMPETITORS_PER_SEARCH,
+            "search_id": "", "competitors": competitors(with_countries=True),
+        })
+    if "CompetitorBaseList" in text:
+        items = competitors()
+        return json.dumps(dict(items[0], competitors=items))
+    return "\n".join(insight_lines("the competitor"))
+
+
+def insight_lines(name):
+    return [
+        f"1. {name} holds a strong position in the premium segment.",
+        "2. Prime locations drive most of its foot traffic.",
+        "3. Limited online ordering is its main weakness.",
+        "4. Catering is an under-served growth channel.",
+    ]
+
+
+def usage(messages, content):
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class StandIns:
+    def __init__(self, args):
+        self.args = args
+        self.base_url = f"http://{args.host}:{args.port}"
+
+    def latency(self, seconds):
+        jitter = self.args.jitter
+        return max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter))
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_route("*", "/logo/{domain}", self.logo)
+        app.router.add_route("*", "/favicon", self.logo)
+        app.router.add_get("/sites/{index}", self.site)
+        return app
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        content = canned_content(messages, self.base_url)
+        completion_id = f"chatcmpl-{uuid4().hex}"
+        model = body.get("model", "gpt-4o")
+        total_latency = self.latency(self.args.llm_latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(total_latency)
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage(messages, content),
+            })
+
+        # Streamed: time to first token, then the rest spread over the chunks
+        chunks = [content[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(content), STREAM_CHUNK_SIZE)]
+        first_token = total_latency * self.args.llm_first_token_fraction
+        per_chunk = (total_latency - first_token) / max(1, len(chunks))
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(first_token)
+        for index, piece in enumerate(chunks):
+            delta = {"content": piece}
+            if index == 0:
+                delta["role"] = "assistant"
+            await response.write(self.sse_chunk(completion_id, model, delta, None))
+            await asyncio.sleep(per_chunk)
+        await response.write(self.sse_chunk(completion_id, model, {}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def sse_chunk(self, completion_id, model, delta, finish_reason):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    async def logo(self, request):
+        await asyncio.sleep(self.latency(self.args.logo_latency))
+        if request.method == "HEAD":
+            return web.Response(content_type="image/png", headers={"Content-Length": str(len(LOGO_BYTES))})
+        return web.Response(body=LOGO_BYTES, content_type="image/png")
+
+    async def site(self, request):
+        index = request.match_info["index"]
+        etag = f'"site-{index}"'
+        await asyncio.sleep(self.latency(self.args.scrape_latency))
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        paragraphs = "\n".join(
+            f"<p>Competitor {index} serves fresh bread, pastries and coffee to customers every day ({n}).</p>"
+            for n in range(self.args.site_paragraphs)
+        )
+        return web.Response(
+            text=SITE_TEMPLATE.format(index=index, paragraphs=paragraphs),
+            content_type="text/html",
+            headers={"ETag": etag},
+        )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="seconds per completion")
+    parser.add_argument("--llm-first-token-fraction", type=float, default=0.2,
+                        help="share of --llm-latency spent before the first streamed chunk")
+    parser.add_argument("--logo-latency", type=float, default=0.05)
+    parser.add_argument("--scrape-latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction applied to every latency")
+    parser.add_argument("--site-paragraphs", type=int, default=40)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    web.run_app(StandIns(args).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
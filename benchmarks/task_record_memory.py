@@ -0,0 +1,65 @@
+"""Redis memory used by task results, full vs compact records.
+
+Writes N synthetic completed searches in the previous layout (full result in
+task:{id} plus the same value in Celery's result backend) and in the compact
+layout (status and search_id reference only), measures both with MEMORY USAGE
+and extrapolates to 10k searches. Uses REDIS_URL (default
+redis://localhost:6379/15) and deletes its keys afterwards.
+
+    python -m benchmarks.task_record_memory --searches 1000
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from uuid import uuid4
+import redis
+from benchmarks.common import sample_competitor
+
+
+def full_records(task_id, search_id):
+    result = {"competitors": [sample_competitor(i) for i in range(12)], "search_id": search_id, "total": 12}
+    task = {"status": "completed", "updated_at": str(datetime.utcnow()), "result": result}
+    celery_meta = {"status": "SUCCESS", "result": result, "traceback": None, "children": [],
+                   "date_done": datetime.utcnow().isoformat(), "task_id": task_id}
+    return {f"bench:task:{task_id}": json.dumps(task), f"bench:celery-task-meta-{task_id}": json.dumps(celery_meta)}
+
+
+def compact_records(task_id, search_id):
+    task = {"status": "completed", "updated_at": str(datetime.utcnow()), "search_id": search_id, "total": 12}
+    return {f"bench:task:{task_id}": json.dumps(task)}
+
+
+def measure(client, build, searches):
+    keys = []
+    pipe = client.pipeline(transaction=False)
+    for _ in range(searches):
+        for key, value in build(str(uuid4()), str(uuid4())).items():
+            pipe.set(key, value, ex=600)
+            keys.append(key)
+    pipe.execute()
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.memory_usage(key, samples=0)
+    total = sum(usage or 0 for usage in pipe.execute())
+    client.delete(*keys)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--searches", type=int, default=1000)
+    args = parser.parse_args()
+
+    client = redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/15"))
+    full = measure(client, full_records, args.searches)
+    compact = measure(client, compact_records, args.searches)
+    scale = 10000 / args.searches
+    print(f"full records:    {full * scale / 1024 / 1024:.1f} MiB per 10k searches")
+    print(f"compact records: {compact * scale / 1024 / 1024:.1f} MiB per 10k searches")
+    print(f"saved:           {(full - compact) * scale / 1024 / 1024:.1f} MiB per 10k searches "
+          f"({(1 - compact / full) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""explain() checks that the hot queries are served by the declared indexes.
+
+Runs against the MongoDB at MONGODB_URL (default mongodb://localhost:27017)
+in a throwaway database, and is skipped when no server is reachable.
+
+    python -m pytest tests/test_indexes.py
+"""
+import asyncio
+import os
+from uuid import uuid4
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+pytest.importorskip("motor")
+
+os.environ["DATABASE_NAME"] = f"fyc_test_indexes_{uuid4().hex[:8]}"
+for name, value in {
+    "JWT_SECRET_KEY": "test-secret",
+    "OPENAI_API_KEY": "test",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+    "MAIL_SERVER": "localhost",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app import database  # noqa: E402
+
+# Index expected in the winning plan of each hot query
+EXPECTED_INDEXES = {
+    "users.email": "email_unique",
+    "competitors.search_id": "search_id_id",
+    "competitors.user_id": "user_id_id",
+    "competitors.name": "name",
+    "competitors.text": "competitor_text",
+    "user_searches.user_id_search_id": "user_id_search_id",
+}
+
+
+def plan_index_names(plan):
+    """Names of every index used anywhere in an explain() plan"""
+    names = set()
+    if isinstance(plan, dict):
+        if "indexName" in plan:
+            names.add(plan["indexName"])
+        for value in plan.values():
+            names |= plan_index_names(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            names |= plan_index_names(item)
+    return names
+
+
+@pytest.fixture(scope="module")
+def mongo():
+    client = pymongo.MongoClient(database.settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("MongoDB is not available")
+    yield client
+    client.drop_database(database.settings.DATABASE_NAME)
+    client.close()
+
+
+@pytest.fixture(scope="module")
+def loop():
+    # The Motor client is bound to the loop it is first used on
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_hot_queries_use_declared_indexes(mongo, loop):
+    async def explain_all():
+        await database.ensure_indexes()
+        served = await database.explain_hot_queries()
+        plans = {}
+        for query_name, (collection_name, query, sort) in database.HOT_QUERIES.items():
+            cursor = database.db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plans[query_name] = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        return served, plans
+
+    served, plans = loop.run_until_complete(explain_all())
+
+    assert all(served.values()), f"Hot queries not served by an index: {served}"
+    for query_name, index_name in EXPECTED_INDEXES.items():
+        assert index_name in plan_index_names(plans[query_name]), \
+            f"{query_name} does not use {index_name}: {plans[query_name]}"
+
+
+def test_ensure_indexes_is_idempotent(mongo, loop):
+    async def ensure_twice():
+        await database.ensure_indexes()
+        await database.ensure_indexes()
+        return await database.get_index_report()
+
+    report = loop.run_until_complete(ensure_twice())
+
+    for collection_name, collection_report in report.items():
+        assert collection_report["missing"] == [], collection_name